@@ -0,0 +1,171 @@
+import math
+import threading
+
+import numpy as np
+
+from cases import NUM_OPTIONS
+
+# ===== ADAPTIVE DIFFICULTY =====
+# An Elo-style online item-response model. Each diagnosis has a difficulty b
+# and each trainee an ability theta, both on the logit scale; the chance of a
+# correct answer is a Rasch curve lifted by the 1-in-NUM_OPTIONS guessing
+# floor:
+#
+#   P(correct) = GUESS + (1 - GUESS) * sigmoid(theta - b)
+#
+# Every answer nudges both by the prediction error, scaled by a step that
+# shrinks as the estimate accumulates answers, so a Submit costs O(1) and
+# nothing is ever refit. Picking a case inverts the curve: it looks for
+# diagnoses whose difficulty gives the trainee the target success rate.
+#
+# Like the scheduler the model lives in memory, one per process. Item
+# difficulties are seeded from the progress store's rollup when the model is
+# built; a trainee's ability is replayed by add_user, outside the lock, from
+# the same history the app loads once for the scheduler.
+
+GUESS = 1 / NUM_OPTIONS
+TARGET_SUCCESS = 0.7
+# Step for an estimate built from n answers: STEP / (1 + STEP_DECAY * n)
+STEP = 1.0
+STEP_DECAY = 0.05
+# Logit width of the band of difficulties picked around the target
+SPREAD = 0.5
+MAX_LOGIT = 4.0
+
+
+def _logit(p):
+    return math.log(p / (1 - p))
+
+
+def _step(answered):
+    return STEP / (1 + STEP_DECAY * answered)
+
+
+def success_logit(target):
+    # theta - b that gives a `target` chance of success
+    lifted = (target - GUESS) / (1 - GUESS)
+    return _logit(min(max(lifted, 0.01), 0.99))
+
+
+class UserAbility:
+    __slots__ = ("theta", "answered", "last")
+
+    def __init__(self):
+        self.theta = 0.0
+        self.answered = 0
+        self.last = None  # dx id of the last pick, not picked twice in a row
+
+
+class AdaptiveModel:
+    def __init__(self, categories, item_counts=(), seed=None):
+        # categories[dx_id] as in Scheduler (None = removed by a reload);
+        # item_counts: (dx id, answered, correct) count rows to seed difficulties
+        self.difficulty = np.zeros(len(categories))
+        self.item_answers = np.zeros(len(categories), dtype=np.int64)
+        self._users = {}
+        self._lock = threading.Lock()
+        self._rng = np.random.default_rng(seed)
+        self._set_categories(categories)
+        self._seed_items(item_counts)
+
+    def _set_categories(self, categories):
+        self.category_of = list(categories)
+        added = len(self.category_of) - len(self.difficulty)
+        if added > 0:
+            # New diagnoses start at average difficulty
+            self.difficulty = np.concatenate([self.difficulty, np.zeros(added)])
+            self.item_answers = np.concatenate([self.item_answers, np.zeros(added, dtype=np.int64)])
+        self.by_category = {}
+        for dx_id, category in enumerate(self.category_of):
+            if category is not None:
+                self.by_category.setdefault(category, []).append(dx_id)
+        self.by_category = {category: np.array(ids) for category, ids in self.by_category.items()}
+        self.active_ids = np.array([dx_id for dx_id, category in enumerate(self.category_of) if category is not None])
+
+    def update_categories(self, categories):
+        # After a knowledge-base reload; existing ids keep their estimates
+        with self._lock:
+            self._set_categories(categories)
+
+    def _seed_items(self, item_counts):
+        # Smoothed accuracy per diagnosis, read back through the curve as the
+        # difficulty an average trainee (theta = 0) would see
+        answered = np.zeros(len(self.difficulty), dtype=np.int64)
+        correct = np.zeros(len(self.difficulty), dtype=np.int64)
+        for dx_id, count, right in item_counts:
+            answered[dx_id] += count
+            correct[dx_id] += right
+        for dx_id in np.flatnonzero(answered).tolist():
+            accuracy = (correct[dx_id] + 1) / (answered[dx_id] + 2)
+            self.difficulty[dx_id] = min(max(-success_logit(accuracy), -MAX_LOGIT), MAX_LOGIT)
+        self.item_answers += answered
+
+    def has_user(self, user_id):
+        return user_id in self._users
+
+    def add_user(self, user_id, history):
+        # history: (dx id, correct, answered_at) oldest first. The replay
+        # moves only the trainee, since the items already counted these
+        # answers when they were seeded; if another session added the same
+        # trainee meanwhile, theirs is kept
+        ability = UserAbility()
+        for dx_id, correct, _ in history:
+            if dx_id < len(self.category_of):
+                self._apply(ability, dx_id, correct, update_item=False)
+        with self._lock:
+            self._users.setdefault(user_id, ability)
+
+    def _user(self, user_id):
+        # A trainee nobody called add_user for starts at average ability
+        ability = self._users.get(user_id)
+        if ability is None:
+            ability = self._users[user_id] = UserAbility()
+        return ability
+
+    def _probability(self, theta, dx_id):
+        return GUESS + (1 - GUESS) / (1 + math.exp(self.difficulty[dx_id] - theta))
+
+    def _apply(self, ability, dx_id, correct, update_item=True):
+        if self.category_of[dx_id] is None:
+            return
+        error = correct - self._probability(ability.theta, dx_id)
+        ability.theta += _step(ability.answered) * error
+        ability.answered += 1
+        if update_item:
+            self.difficulty[dx_id] -= _step(self.item_answers[dx_id]) * error
+            self.item_answers[dx_id] += 1
+
+    def record(self, user_id, dx_id, correct):
+        with self._lock:
+            self._apply(self._user(user_id), dx_id, correct)
+
+    def reset(self, user_id):
+        with self._lock:
+            self._users[user_id] = UserAbility()
+
+    def predict(self, user_id, dx_id):
+        # Chance this trainee answers a case on this diagnosis correctly
+        with self._lock:
+            return self._probability(self._user(user_id).theta, dx_id)
+
+    def next(self, user_id, target=TARGET_SUCCESS, category=None):
+        # A diagnosis near the difficulty that gives `target` success,
+        # sampled from a Gaussian band so the same one doesn't come up every time
+        with self._lock:
+            ability = self._user(user_id)
+            pool = self.by_category[category] if category else self.active_ids
+            gap = self.difficulty[pool] - (ability.theta - success_logit(target))
+            weights = np.exp(-0.5 * (gap / SPREAD) ** 2)
+            if len(pool) > 1:
+                weights[pool == ability.last] = 0
+            cumulative = np.cumsum(weights)
+            if cumulative[-1] > 0:
+                dx_id = int(pool[np.searchsorted(cumulative, self._rng.random() * cumulative[-1], side="right")])
+            else:
+                # Nothing near the target; take the closest, still not the last
+                distance = np.abs(gap)
+                if len(pool) > 1:
+                    distance[pool == ability.last] = np.inf
+                dx_id = int(pool[np.argmin(distance)])
+            ability.last = dx_id
+            return dx_id
@@ -0,0 +1,140 @@
+import numpy as np
+
+from knowledge_base import URGENCY_TIERS, urgency_tier
+
+# ===== COHORT ANALYTICS =====
+# Program-wide views over every trainee's answers. The progress store keeps a
+# rollup of answer counts per (user, diagnosis, chosen, category), so loading
+# a cohort is one query. It yields a few integer columns, with names kept in
+# one dictionary array. Every view is a masked np.bincount group-by over
+# those columns; nothing loops over events in Python.
+#
+# Counts include answers from before a trainee's last reset: resets restart
+# the trainee's own sidebar totals, not the program's record.
+
+UNKNOWN_URGENCY = "UNKNOWN"
+
+
+def _group(codes, size, *weights):
+    # Per-code sums of each weight column
+    return [np.bincount(codes, weights=w, minlength=size) for w in weights]
+
+
+class AnswerRollup:
+    def __init__(self, users, diagnoses, chosen, categories, answered, latency_sum, latency_count, names):
+        self.users = users
+        self.diagnoses = diagnoses
+        self.chosen = chosen
+        self.categories = categories
+        self.answered = answered
+        self.latency_sum = latency_sum
+        self.latency_count = latency_count
+        self.names = names  # code -> name, shared by every code column
+        self.correct = np.where(diagnoses == chosen, answered, 0)
+
+    @classmethod
+    def from_store(cls, store):
+        rows, names = store.rollup()
+        table = np.array(rows, dtype=np.float64).reshape(-1, 7)
+        codes = table[:, :4].astype(np.int64)
+        name_array = np.empty(max(names, default=0) + 1, dtype=object)
+        for code, name in names.items():
+            name_array[code] = name
+        return cls(
+            codes[:, 0], codes[:, 1], codes[:, 2], codes[:, 3],
+            table[:, 4].astype(np.int64), table[:, 5], table[:, 6].astype(np.int64), name_array,
+        )
+
+    def __len__(self):
+        return len(self.answered)
+
+    def select(self, mask):
+        return AnswerRollup(
+            self.users[mask], self.diagnoses[mask], self.chosen[mask], self.categories[mask],
+            self.answered[mask], self.latency_sum[mask], self.latency_count[mask], self.names,
+        )
+
+    def cohort(self, prefix):
+        # Trainees whose ID starts with prefix, e.g. "pgy2-"
+        if not prefix:
+            return self
+        matching = np.array([isinstance(n, str) and n.startswith(prefix) for n in self.names], dtype=bool)
+        return self.select(matching[self.users])
+
+    def totals(self):
+        answered = int(self.answered.sum())
+        return {
+            "trainees": len(np.unique(self.users)),
+            "answered": answered,
+            "accuracy": self.correct.sum() / answered * 100 if answered else 0.0,
+            "mean_latency": self.latency_sum.sum() / max(self.latency_count.sum(), 1),
+        }
+
+    def _table(self, codes, labels, label_name):
+        # One row per label with any answers, in label order
+        answered, correct, latency_sum, latency_count = _group(
+            codes, len(labels), self.answered, self.correct, self.latency_sum, self.latency_count
+        )
+        rows = []
+        for i in np.flatnonzero(answered):
+            rows.append({
+                label_name: labels[i],
+                "Answered": int(answered[i]),
+                "Accuracy (%)": round(correct[i] / answered[i] * 100, 1),
+                "Mean response (s)": round(latency_sum[i] / latency_count[i], 1) if latency_count[i] else None,
+            })
+        return rows
+
+    def by_name(self, column, label_name):
+        # Group by one of the name-coded columns: users, diagnoses, categories
+        rows = self._table(getattr(self, column), self.names, label_name)
+        return sorted(rows, key=lambda row: row[label_name])
+
+    def by_urgency(self, kb):
+        # Urgency comes from the current knowledge base; diagnoses it no
+        # longer has, or with a tier outside URGENCY_TIERS, fall under UNKNOWN
+        tiers = URGENCY_TIERS + [UNKNOWN_URGENCY]
+        tier_codes = {tier: code for code, tier in enumerate(URGENCY_TIERS)}
+        tier_of_name = np.full(len(self.names), len(URGENCY_TIERS), dtype=np.int64)
+        for code, name in enumerate(self.names):
+            if name in kb:
+                tier_of_name[code] = tier_codes.get(urgency_tier(kb[name]["urgency"]), len(URGENCY_TIERS))
+        return self._table(tier_of_name[self.diagnoses], tiers, "Urgency")
+
+    def confusions(self, limit=20):
+        # Most frequent wrong picks: (diagnosis, chosen instead, count, share of that diagnosis's answers)
+        wrong = self.diagnoses != self.chosen
+        size = len(self.names)
+        # Grouped with np.unique: the names dictionary also holds every
+        # trainee ID, so a bincount over size * size pair codes would grow
+        # with the square of the cohort
+        pairs, inverse = np.unique(self.diagnoses[wrong] * size + self.chosen[wrong], return_inverse=True)
+        pair_counts = np.bincount(inverse, weights=self.answered[wrong], minlength=len(pairs))
+        per_diagnosis = np.bincount(self.diagnoses, weights=self.answered, minlength=size)
+        top = np.argsort(-pair_counts, kind="stable")[:limit]
+        return [
+            {
+                "Diagnosis": self.names[pairs[i] // size],
+                "Chosen instead": self.names[pairs[i] % size],
+                "Times": int(pair_counts[i]),
+                "Share (%)": round(pair_counts[i] / per_diagnosis[pairs[i] // size] * 100, 1),
+            }
+            for i in top
+        ]
+
+    def confusion_matrix(self, diagnoses):
+        # Dense (answer x chosen) counts for the given diagnosis names; the
+        # columns are every diagnosis any of them was answered with
+        code_of = {name: code for code, name in enumerate(self.names)}
+        row_codes = np.array([code_of.get(name, -1) for name in diagnoses], dtype=np.int64)
+        position = np.full(len(self.names), -1, dtype=np.int64)
+        position[row_codes[row_codes >= 0]] = np.flatnonzero(row_codes >= 0)
+        in_rows = position[self.diagnoses] >= 0
+        col_codes = np.unique(self.chosen[in_rows])
+        col_position = np.full(len(self.names), -1, dtype=np.int64)
+        col_position[col_codes] = np.arange(len(col_codes))
+        cells = position[self.diagnoses[in_rows]] * len(col_codes) + col_position[self.chosen[in_rows]]
+        matrix = np.bincount(
+            cells, weights=self.answered[in_rows], minlength=len(diagnoses) * len(col_codes)
+        ).reshape(len(diagnoses), len(col_codes)).astype(np.int64)
+        return matrix, [self.names[code] for code in col_codes]
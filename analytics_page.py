@@ -0,0 +1,59 @@
+import streamlit as st
+
+from analytics import AnswerRollup
+
+# ===== COHORT ANALYTICS PAGE =====
+# Imported by app.py only when the analytics view is opened. The rollup is
+# loaded once per ANALYTICS_TTL for the whole process, not per viewer.
+
+ANALYTICS_TTL = 30
+
+
+@st.cache_resource(ttl=ANALYTICS_TTL)
+def load_rollup(_store):
+    return AnswerRollup.from_store(_store)
+
+
+def render(store, kb):
+    st.markdown("### 📊 Cohort Analytics")
+    rollup = load_rollup(store)
+    prefix = st.text_input("Cohort (trainee ID prefix):", placeholder="e.g. pgy2-")
+    cohort = rollup.cohort(prefix.strip())
+    totals = cohort.totals()
+    if not totals["answered"]:
+        st.info("No answers recorded for this cohort yet.")
+        return
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Trainees", totals["trainees"])
+    col2.metric("Answers", f"{totals['answered']:,}")
+    col3.metric("Accuracy", f"{totals['accuracy']:.1f}%")
+    col4.metric("Mean response", f"{totals['mean_latency']:.1f} s")
+    st.caption(f"Refreshed every {ANALYTICS_TTL} seconds. Includes answers from before a trainee's progress reset.")
+
+    specialty, urgency, diagnosis, confusion, trainees = st.tabs(
+        ["By specialty", "By urgency", "By diagnosis", "Confusions", "Trainees"]
+    )
+    with specialty:
+        rows = cohort.by_name("categories", "Specialty")
+        st.bar_chart(
+            {"Specialty": [row["Specialty"] for row in rows], "Accuracy (%)": [row["Accuracy (%)"] for row in rows]},
+            x="Specialty", y="Accuracy (%)", horizontal=True,
+        )
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+    with urgency:
+        st.dataframe(cohort.by_urgency(kb), hide_index=True, use_container_width=True)
+    with diagnosis:
+        st.dataframe(cohort.by_name("diagnoses", "Diagnosis"), hide_index=True, use_container_width=True)
+    with confusion:
+        st.markdown("**Most common wrong answers**")
+        st.dataframe(cohort.confusions(), hide_index=True, use_container_width=True)
+        category = st.selectbox("Confusion matrix for:", list(kb.categories))
+        names = kb.in_category(category)
+        matrix, columns = cohort.confusion_matrix(names)
+        st.dataframe(
+            {"Answer \\ chosen": names, **{column: matrix[:, j] for j, column in enumerate(columns)}},
+            hide_index=True, use_container_width=True,
+        )
+    with trainees:
+        st.dataframe(cohort.by_name("users", "Trainee"), hide_index=True, use_container_width=True)
@@ -1,331 +1,19 @@
+import hmac
+import math
+import os
+import time
+import uuid
+
 import streamlit as st
-import random
-
-# ===== COMPREHENSIVE OPHTHALMOLOGY DATABASE (45+ DIAGNOSES) =====
-diagnoses = {
-    # RETINA (15 diagnoses)
-    "CRAO (Central Retinal Artery Occlusion)": {
-        "symptoms": ["sudden painless vision loss", "complete blackness"],
-        "key_finding": "APD, cherry red spot", 
-        "urgency": "EMERGENT - 4-6 hour window",
-        "category": "Retina",
-        "teaching": ["Time is vision! 4-6 hour window", "Always check for APD", "Look for cherry red spot"]
-    },
-    "Retinal Detachment": {
-        "symptoms": ["floaters", "flashes", "curtain over vision"],
-        "key_finding": "visual field defect, retinal tear",
-        "urgency": "URGENT - 24-48 hours", 
-        "category": "Retina",
-        "teaching": ["Ask about floaters and flashes", "Check visual fields", "Ultra-sound if no view"]
-    },
-    "CRVO (Central Retinal Vein Occlusion)": {
-        "symptoms": ["gradual vision loss", "multiple dark spots"],
-        "key_finding": "retinal hemorrhages, disc edema",
-        "urgency": "URGENT - needs workup",
-        "category": "Retina",
-        "teaching": ["Workup for hypertension/diabetes", "Monitor for neovascularization"]
-    },
-    "BRVO (Branch Retinal Vein Occlusion)": {
-        "symptoms": ["sudden vision loss", "field defect"],
-        "key_finding": "sectoral retinal hemorrhages",
-        "urgency": "URGENT - macular edema risk",
-        "category": "Retina",
-        "teaching": ["Sectoral pattern characteristic", "Treat macular edema if present"]
-    },
-    "Diabetic Retinopathy (NPDR)": {
-        "symptoms": ["asymptomatic", "gradual vision loss"],
-        "key_finding": "microaneurysms, dot-blot hemorrhages",
-        "urgency": "ROUTINE - annual screening",
-        "category": "Retina", 
-        "teaching": ["Annual dilated exams for diabetics", "Tight glycemic control slows progression"]
-    },
-    "Diabetic Retinopathy (PDR)": {
-        "symptoms": ["floaters", "vision loss", "asymptomatic"],
-        "key_finding": "neovascularization, vitreous hemorrhage",
-        "urgency": "URGENT - needs laser",
-        "category": "Retina",
-        "teaching": ["Pan-retinal photocoagulation indicated", "High risk of vision loss"]
-    },
-    "Diabetic Macular Edema": {
-        "symptoms": ["gradual vision loss", "metamorphopsia"],
-        "key_finding": "retinal thickening, hard exudates",
-        "urgency": "URGENT - needs treatment",
-        "category": "Retina",
-        "teaching": ["Anti-VEGF first line treatment", "Laser for non-center involving"]
-    },
-    "Macular Degeneration (Dry)": {
-        "symptoms": ["gradual central vision loss"],
-        "key_finding": "drusen, geographic atrophy", 
-        "urgency": "ROUTINE - monitoring",
-        "category": "Retina",
-        "teaching": ["AREDS2 supplements may help", "Low vision rehabilitation"]
-    },
-    "Macular Degeneration (Wet)": {
-        "symptoms": ["rapid central vision loss", "metamorphopsia"],
-        "key_finding": "subretinal fluid, hemorrhage, CNV",
-        "urgency": "URGENT - anti-VEGF needed",
-        "category": "Retina",
-        "teaching": ["Anti-VEGF injections mainstay", "Monthly monitoring initially"]
-    },
-    "Macular Hole": {
-        "symptoms": ["central vision loss", "metamorphopsia"],
-        "key_finding": "full-thickness retinal defect on OCT",
-        "urgency": "URGENT - surgical consideration",
-        "category": "Retina", 
-        "teaching": ["Vitrectomy often required", "Watch for progression"]
-    },
-    "Epiretinal Membrane": {
-        "symptoms": ["gradual vision loss", "metamorphopsia"],
-        "key_finding": "retinal surface wrinkling",
-        "urgency": "ELECTIVE - if symptomatic",
-        "category": "Retina",
-        "teaching": ["Cellophane maculopathy", "Surgery for significant symptoms"]
-    },
-    "Retinitis Pigmentosa": {
-        "symptoms": ["night blindness", "tunnel vision"],
-        "key_finding": "bone spicule pigmentation",
-        "urgency": "ROUTINE - genetic counseling",
-        "category": "Retina",
-        "teaching": ["Inherited pattern important", "Low vision services helpful"]
-    },
-    "Hypertensive Retinopathy": {
-        "symptoms": ["asymptomatic", "headaches"],
-        "key_finding": "arteriolar narrowing, AV nicking",
-        "urgency": "URGENT - BP control",
-        "category": "Retina",
-        "teaching": ["Grade I-IV severity scale", "Reflects systemic BP control"]
-    },
-    "Vitreous Hemorrhage": {
-        "symptoms": ["sudden floaters", "red haze", "vision loss"],
-        "key_finding": "no red reflex, blood in vitreous",
-        "urgency": "URGENT - needs ultrasound",
-        "category": "Retina",
-        "teaching": ["Ultrasound to rule out detachment", "Monitor for clearance"]
-    },
-    "Retinoblastoma": {
-        "symptoms": ["leukocoria", "strabismus", "poor vision"],
-        "key_finding": "white retinal mass, calcifications",
-        "urgency": "EMERGENT - oncology referral",
-        "category": "Retina",
-        "teaching": ["Most common pediatric intraocular cancer", "Genetic counseling needed"]
-    },
-
-    # GLAUCOMA (8 diagnoses)
-    "Angle Closure Glaucoma": {
-        "symptoms": ["eye pain", "headache", "nausea", "halos"],
-        "key_finding": "elevated IOP, corneal edema",
-        "urgency": "EMERGENT - immediate treatment",
-        "category": "Glaucoma",
-        "teaching": ["Check IOP immediately", "Laser iridotomy definitive treatment"]
-    },
-    "Open Angle Glaucoma": {
-        "symptoms": ["asymptomatic", "peripheral vision loss"],
-        "key_finding": "elevated IOP, optic nerve cupping",
-        "urgency": "URGENT - needs treatment",
-        "category": "Glaucoma",
-        "teaching": ["Lifelong medication typically needed", "Monitor progression with fields"]
-    },
-    "Normal Tension Glaucoma": {
-        "symptoms": ["asymptomatic", "field loss"],
-        "key_finding": "optic nerve damage with normal IOP",
-        "urgency": "URGENT - workup needed",
-        "category": "Glaucoma",
-        "teaching": ["Treat despite normal pressure", "Consider vascular factors"]
-    },
-    "Pigmentary Glaucoma": {
-        "symptoms": ["young myopic male", "exercise-induced blurring"],
-        "key_finding": "Krukenberg spindle, iris transillumination",
-        "urgency": "URGENT - needs treatment",
-        "category": "Glaucoma",
-        "teaching": ["Reverse pupillary block mechanism", "Laser iridotomy may help"]
-    },
-    "Pseudoexfoliation Glaucoma": {
-        "symptoms": ["asymptomatic", "unilateral often"],
-        "key_finding": "white material on lens surface",
-        "urgency": "URGENT - aggressive course",
-        "category": "Glaucoma",
-        "teaching": ["Systemic condition", "Poor response to medications"]
-    },
-    "Neovascular Glaucoma": {
-        "symptoms": ["pain", "redness", "vision loss"],
-        "key_finding": "iris neovascularization, elevated IOP",
-        "urgency": "EMERGENT - pan-retinal photocoagulation",
-        "category": "Glaucoma",
-        "teaching": ["Always underlying retinal ischemia", "Treat underlying cause"]
-    },
-    "Uveitic Glaucoma": {
-        "symptoms": ["pain", "redness", "photophobia"],
-        "key_finding": "inflammation, elevated IOP",
-        "urgency": "URGENT - control inflammation first",
-        "category": "Glaucoma",
-        "teaching": ["Treat inflammation before IOP", "Steroid-induced component"]
-    },
-    "Congenital Glaucoma": {
-        "symptoms": ["infant with tearing", "photophobia", "large eyes"],
-        "key_finding": "enlarged cornea, Haab striae",
-        "urgency": "EMERGENT - surgical intervention",
-        "category": "Glaucoma",
-        "teaching": ["Tearing and photophobia classic", "Surgical treatment required"]
-    },
-
-    # CORNEA/ANTERIOR SEGMENT (12 diagnoses)
-    "Corneal Ulcer": {
-        "symptoms": ["severe pain", "purulent discharge", "photophobia"],
-        "key_finding": "corneal infiltrate, epithelial defect", 
-        "urgency": "URGENT - needs cultures",
-        "category": "Cornea",
-        "teaching": ["Contact lens major risk factor", "Never patch infected ulcer"]
-    },
-    "Herpes Simplex Keratitis": {
-        "symptoms": ["pain", "redness", "photophobia", "decreased vision"],
-        "key_finding": "dendritic ulcer with fluorescein staining",
-        "urgency": "EMERGENT - antiviral needed",
-        "category": "Cornea",
-        "teaching": ["Dendritic pattern pathognomonic", "Avoid steroids initially"]
-    },
-    "Herpes Zoster Ophthalmicus": {
-        "symptoms": ["pain", "vesicular rash in V1 distribution", "redness"],
-        "key_finding": "dermatomal rash, keratitis",
-        "urgency": "EMERGENT - antiviral treatment",
-        "category": "Cornea",
-        "teaching": ["V1 distribution characteristic", "Can cause multiple ocular complications"]
-    },
-    "Cataract": {
-        "symptoms": ["gradual vision loss", "glare", "halos", "faded colors"],
-        "key_finding": "lens opacity on slit lamp",
-        "urgency": "ELECTIVE - when affects QOL",
-        "category": "Cataract",
-        "teaching": ["Most common reversible blindness", "Surgery when affects ADLs"]
-    },
-    "Anterior Uveitis": {
-        "symptoms": ["eye pain", "photophobia", "redness", "blurred vision"],
-        "key_finding": "cells and flare in anterior chamber",
-        "urgency": "URGENT - steroid treatment",
-        "category": "Uveitis",
-        "teaching": ["Look for systemic associations", "Cycloplegics for pain relief"]
-    },
-    "Pterygium": {
-        "symptoms": ["redness", "foreign body sensation", "cosmetic concern"],
-        "key_finding": "triangular fibrovascular growth from conjunctiva",
-        "urgency": "ELECTIVE - if symptomatic",
-        "category": "Cornea",
-        "teaching": ["UV light exposure risk factor", "Surgery for growth toward visual axis"]
-    },
-    "Dry Eye Syndrome": {
-        "symptoms": ["burning", "foreign body sensation", "redness", "blurry vision"],
-        "key_finding": "reduced tear break-up time, corneal staining",
-        "urgency": "ROUTINE - symptomatic treatment",
-        "category": "Cornea",
-        "teaching": ["Multifactorial condition", "Artificial tears first line"]
-    },
-    "Blepharitis": {
-        "symptoms": ["eyelid crusting", "redness", "itching", "burning"],
-        "key_finding": "eyelid margin inflammation, collarettes",
-        "urgency": "ROUTINE - lid hygiene",
-        "category": "Cornea",
-        "teaching": ["Chronic condition", "Lid hygiene cornerstone of treatment"]
-    },
-    "Conjunctivitis (Bacterial)": {
-        "symptoms": ["redness", "purulent discharge", "crusting"],
-        "key_finding": "conjunctival injection, discharge",
-        "urgency": "URGENT - antibiotic treatment",
-        "category": "Cornea",
-        "teaching": ["Purulent discharge characteristic", "Topical antibiotics effective"]
-    },
-    "Conjunctivitis (Viral)": {
-        "symptoms": ["redness", "watery discharge", "preauricular lymphadenopathy"],
-        "key_finding": "conjunctival injection, follicular reaction",
-        "urgency": "URGENT - supportive care",
-        "category": "Cornea",
-        "teaching": ["Highly contagious", "Supportive treatment usually sufficient"]
-    },
-    "Conjunctivitis (Allergic)": {
-        "symptoms": ["itching", "redness", "watery discharge", "seasonal"],
-        "key_finding": "conjunctival injection, papillae",
-        "urgency": "ROUTINE - allergen avoidance",
-        "category": "Cornea",
-        "teaching": ["Itching is hallmark symptom", "Allergen avoidance and antihistamines"]
-    },
-    "Episcleritis": {
-        "symptoms": ["redness", "mild discomfort"],
-        "key_finding": "sectoral injection, blanches with phenylephrine",
-        "urgency": "ROUTINE - often self-limited",
-        "category": "Cornea",
-        "teaching": ["Benign condition", "Distinguish from scleritis"]
-    },
-
-    # NEURO-OPHTHALMOLOGY (10 diagnoses)
-    "Optic Neuritis": {
-        "symptoms": ["pain with eye movement", "color desaturation", "vision loss"],
-        "key_finding": "APD, optic disc edema",
-        "urgency": "URGENT - steroid consideration", 
-        "category": "Neuro-Ophthalmology",
-        "teaching": ["Often associated with MS", "Pain with movement classic"]
-    },
-    "Giant Cell Arteritis": {
-        "symptoms": ["elderly", "headache", "jaw claudication", "vision loss"],
-        "key_finding": "elevated ESR/CRP, disc edema",
-        "urgency": "EMERGENT - immediate steroids",
-        "category": "Neuro-Ophthalmology",
-        "teaching": ["Risk of bilateral blindness", "Start steroids if suspected"]
-    },
-    "Non-Arteritic Ischemic Optic Neuropathy": {
-        "symptoms": ["altitudinal vision loss", "often upon awakening"],
-        "key_finding": "disc edema, altitudinal field defect",
-        "urgency": "URGENT - vascular workup",
-        "category": "Neuro-Ophthalmology",
-        "teaching": ["Associated with vascular risk factors", "No proven treatment"]
-    },
-    "Papilledema": {
-        "symptoms": ["transient visual obscurations", "headache", "nausea"],
-        "key_finding": "bilateral optic disc edema",
-        "urgency": "EMERGENT - rule out mass lesion",
-        "category": "Neuro-Ophthalmology",
-        "teaching": ["Always bilateral", "Requires neuroimaging and LP"]
-    },
-    "Third Nerve Palsy": {
-        "symptoms": ["diplopia", "ptosis", "dilated pupil"],
-        "key_finding": "impaired adduction, elevation, depression",
-        "urgency": "EMERGENT - if pupil involved",
-        "category": "Neuro-Ophthalmology",
-        "teaching": ["Pupil involvement suggests compression", "Medical emergency if pupil involved"]
-    },
-    "Fourth Nerve Palsy": {
-        "symptoms": ["vertical diplopia", "head tilt"],
-        "key_finding": "hypertropia worse on contralateral gaze",
-        "urgency": "URGENT - workup needed",
-        "category": "Neuro-Ophthalmology",
-        "teaching": ["Head tilt compensates for extorsion", "Congenital or acquired"]
-    },
-    "Sixth Nerve Palsy": {
-        "symptoms": ["horizontal diplopia", "esotropia"],
-        "key_finding": "impaired abduction",
-        "urgency": "URGENT - workup needed",
-        "category": "Neuro-Ophthalmology",
-        "teaching": ["False localizing sign with ICP", "Workup for underlying cause"]
-    },
-    "Myasthenia Gravis": {
-        "symptoms": ["variable ptosis", "diplopia", "fatigability"],
-        "key_finding": "fatigable ptosis, ice pack test positive",
-        "urgency": "URGENT - neurology referral",
-        "category": "Neuro-Ophthalmology",
-        "teaching": ["Fatigability characteristic", "Ice pack test diagnostic"]
-    },
-    "Homonymous Hemianopsia": {
-        "symptoms": ["visual field loss", "reading difficulty"],
-        "key_finding": "congruous homonymous field defect",
-        "urgency": "EMERGENT - if acute",
-        "category": "Neuro-Ophthalmology",
-        "teaching": ["Localizes to contralateral optic tract", "Stroke workup if acute"]
-    },
-    "Pituitary Adenoma": {
-        "symptoms": ["bitemporal hemianopsia", "headache", "endocrine symptoms"],
-        "key_finding": "bitemporal field defect",
-        "urgency": "URGENT - endocrine workup",
-        "category": "Neuro-Ophthalmology",
-        "teaching": ["Bitemporal pattern localizes to chiasm", "Endocrine evaluation essential"]
-    }
-}
+
+import metrics
+from adaptive import TARGET_SUCCESS, AdaptiveModel
+from cases import PROMPT, CasePool
+from exam import EXAM_LENGTHS, SECONDS_PER_QUESTION, Exam
+from explanations import explanation_markdown
+from hot_reload import KnowledgeBaseWatcher
+from progress import make_event, open_progress_store
+from scheduler import Scheduler
 
 # ===== STREAMLIT APP CONFIGURATION =====
 st.set_page_config(
@@ -335,23 +23,137 @@ st.set_page_config(
 )
 
 # Initialize session state
-if "question_count" not in st.session_state:
-    st.session_state.question_count = 0
-if "correct_count" not in st.session_state:
-    st.session_state.correct_count = 0
+# The trainee ID lives in the URL (?trainee=...), so a refresh or a bookmark
+# comes back to the same progress. Programs hand out personal links; a
+# visitor without one gets an unguessable guest ID written into the URL.
+# There is no field to type another ID: whoever has a link has its progress.
+if "user_id" not in st.session_state:
+    trainee = st.query_params.get("trainee")
+    if not trainee:
+        trainee = st.query_params["trainee"] = f"guest-{uuid.uuid4().hex}"
+    st.session_state.user_id = trainee
 if "current_question" not in st.session_state:
     st.session_state.current_question = None
+if "question_shown_at" not in st.session_state:
+    st.session_state.question_shown_at = None
+if "submitted_answer" not in st.session_state:
+    st.session_state.submitted_answer = None
+if "revealed_stages" not in st.session_state:
+    st.session_state.revealed_stages = 1
+if "explorer_open" not in st.session_state:
+    st.session_state.explorer_open = set()
+if "exam" not in st.session_state:
+    st.session_state.exam = None
+if "analytics_unlocked" not in st.session_state:
+    st.session_state.analytics_unlocked = False
 
-# Calculate statistics
-categories = {}
-for dx_info in diagnoses.values():
-    cat = dx_info["category"]
-    categories[cat] = categories.get(cat, 0) + 1
+# ===== COHORT ANALYTICS ACCESS =====
+# The analytics view names every trainee ID, and a trainee's ID is all it
+# takes to open (or reset) their progress, so the view is for program
+# directors only: it is offered when TRAINER_ANALYTICS_KEY is set and opens
+# once that key is entered in the session.
+ANALYTICS_KEY = os.environ.get("TRAINER_ANALYTICS_KEY")
 
-total_diagnoses = len(diagnoses)
+# ===== KNOWLEDGE BASE (parsed once per process, hot-reloaded on edits) =====
+# The watcher swaps in a new engine (knowledge base, case generator, search
+# index) when the data files change. Each script run reads it once, so one
+# rerun never mixes two versions.
+@st.cache_resource
+def get_watcher():
+    return KnowledgeBaseWatcher().start()
 
-# Comprehensive header
-st.markdown(f"""
+# ===== PROGRESS STORE (shared by every session in this process) =====
+@st.cache_resource
+def get_progress_store():
+    return open_progress_store()
+
+# ===== METRICS EXPORTERS (Prometheus text; see metrics.py) =====
+@st.cache_resource
+def start_metrics():
+    return metrics.start_exporters()
+
+# ===== SPACED-REPETITION SCHEDULER =====
+@st.cache_resource
+def get_scheduler():
+    watcher = get_watcher()
+    scheduler = Scheduler(watcher.engine.generator.category_of)
+    watcher.listeners.append(lambda engine, changed, removed: scheduler.update_categories(engine.generator.category_of))
+    return scheduler
+
+@st.cache_resource
+def get_trainee_resets():
+    # {user_id: reset_at} last seen by this process, to notice a Reset made
+    # through another app worker
+    return {}
+
+def load_history(watcher, store, user_id):
+    # A trainee's answers as (dx id, correct, answered_at), oldest first
+    generator = watcher.engine.generator
+    for dx, correct, answered_at in store.history(user_id):
+        if dx in generator.ids:
+            yield generator.ids[dx], correct, answered_at
+
+# ===== ADAPTIVE DIFFICULTY (online item-response model; see adaptive.py) =====
+@st.cache_resource
+def get_adaptive():
+    watcher = get_watcher()
+    store = get_progress_store()
+    # Item difficulties start from every answer on record
+    rows, names = store.rollup()
+    ids = watcher.engine.generator.ids
+    item_counts = [
+        (ids[names[dx]], answered, answered if chosen == dx else 0)
+        for _, dx, chosen, _, answered, _, _ in rows if names[dx] in ids
+    ]
+    model = AdaptiveModel(watcher.engine.generator.category_of, item_counts)
+    watcher.listeners.append(lambda engine, changed, removed: model.update_categories(engine.generator.category_of))
+    return model
+
+engine = get_watcher().engine
+kb = engine.kb
+generator = engine.generator
+store = get_progress_store()
+scheduler = get_scheduler()
+adaptive = get_adaptive()
+start_metrics()
+
+def load_trainee(user_id):
+    # Replays a trainee's history into the scheduler and the adaptive model
+    # the first time this process sees them. The history is read from the
+    # progress store once for both, here on page load rather than on Submit,
+    # and outside either lock. A Reset made through another worker reaches
+    # this process with the store's summary (within its STATS_TTL) and
+    # restarts the trainee here too.
+    reset_at = store.summary(user_id).reset_at
+    resets = get_trainee_resets()
+    if resets.setdefault(user_id, reset_at) != reset_at:
+        resets[user_id] = reset_at
+        scheduler.reset(user_id)
+        adaptive.reset(user_id)
+    if not (scheduler.has_user(user_id) and adaptive.has_user(user_id)):
+        history = list(load_history(get_watcher(), store, user_id))
+        scheduler.add_user(user_id, history)
+        adaptive.add_user(user_id, history)
+
+load_trainee(st.session_state.user_id)
+if "case_pool" not in st.session_state:
+    st.session_state.case_pool = CasePool(generator)
+st.session_state.case_pool.rebind(generator)
+# A case showing a diagnosis edited since it was generated is dropped;
+# cases built only from unchanged entries carry on across a reload
+if st.session_state.current_question and not generator.is_current(st.session_state.current_question):
+    st.session_state.current_question = None
+    st.session_state.submitted_answer = None
+    st.toast("The current case was updated in the knowledge base - please generate a new one.")
+diagnoses = kb.diagnoses
+categories = kb.categories
+total_diagnoses = kb.total_diagnoses
+
+# ===== STATIC PAGE HTML (built once per knowledge-base version) =====
+@st.cache_resource(max_entries=2)
+def get_static_html(_kb, version):
+    kb = _kb
+    header = f"""
 <div style="
     background: linear-gradient(135deg, #1A237E, #1565C0);
     color: white;
@@ -363,119 +165,354 @@ st.markdown(f"""
 ">
     <h1 style="color: white; margin: 0; font-size: 2.5rem;">👁️ Ophthalmology AI Trainer</h1>
     <p style="margin: 0.5rem 0 0 0; font-size: 1.3rem; opacity: 0.9;">
-        Comprehensive Edition - {total_diagnoses} Diagnoses
+        Comprehensive Edition - {kb.total_diagnoses} Diagnoses
     </p>
     <p style="margin: 0.5rem 0 0 0; font-size: 1rem; opacity: 0.8;">
-        {', '.join([f'{cat} ({count})' for cat, count in categories.items()])}
+        {', '.join([f'{cat} ({count})' for cat, count in kb.categories.items()])}
     </p>
 </div>
-""", unsafe_allow_html=True)
+"""
+    distribution = "\n\n".join(
+        f"**{category}:** {count} diagnoses" for category, count in sorted(kb.categories.items())
+    )
+    footer = f"""
+<div style="text-align: center; color: #666; padding: 2rem;">
+    <p><strong>Comprehensive Ophthalmology AI Trainer</strong> • {kb.total_diagnoses} Diagnoses • {len(kb.categories)} Specialties</p>
+    <p><small>Professional medical education platform for ophthalmology training</small></p>
+</div>
+"""
+    return {"header": header, "distribution": distribution, "footer": footer}
 
-# Sidebar with comprehensive database info
-with st.sidebar:
-    st.markdown("### 🏥 Database Overview")
-    st.metric("Total Diagnoses", total_diagnoses)
-    st.metric("Medical Specialties", len(categories))
-    
-    st.markdown("### 📊 Specialty Distribution")
-    for category, count in sorted(categories.items()):
-        st.write(f"**{category}:** {count} diagnoses")
-    
+# ===== PAGE SECTIONS =====
+# Each interactive section is an st.fragment, so its widgets rerun only that
+# section. Submit and Reset change what both the case panel and the sidebar
+# show, so they trigger a full-app rerun instead.
+
+@st.fragment
+def progress_panel():
     st.markdown("### 👨‍⚕️ User Progress")
-    accuracy = (st.session_state.correct_count / st.session_state.question_count * 100) if st.session_state.question_count > 0 else 0
-    st.metric("Questions Answered", st.session_state.question_count)
-    st.metric("Accuracy Rate", f"{accuracy:.1f}%")
+    st.caption(f"Trainee ID: `{st.session_state.user_id}` - bookmark this page to keep your progress")
+    stats = store.summary(st.session_state.user_id)
+    st.metric("Questions Answered", stats.answered)
+    st.metric("Accuracy Rate", f"{stats.accuracy:.1f}%")
     
     if st.button("🔄 Reset Progress", use_container_width=True):
-        st.session_state.question_count = 0
-        st.session_state.correct_count = 0
+        store.reset(st.session_state.user_id)
+        scheduler.reset(st.session_state.user_id)
+        adaptive.reset(st.session_state.user_id)
         st.session_state.current_question = None
-        st.rerun()
+        st.session_state.submitted_answer = None
+        st.session_state.exam = None
+        st.rerun(scope="app")
 
-# Main app content
-col1, col2 = st.columns([2, 1])
+DIFFICULTY_LABELS = {"near": "Hard - similar diagnoses", "mid": "Medium", "far": "Easy - unrelated diagnoses"}
+
+def grade(question, chosen, mode, latency):
+    # Scheduler and progress store updates for one answer; returns seconds taken
+    start = time.perf_counter()
+    correct = chosen == question.answer
+    scheduler.record(st.session_state.user_id, question.answer, correct)
+    adaptive.record(st.session_state.user_id, question.answer, correct)
+    store.record(make_event(
+        st.session_state.user_id,
+        generator.names[question.answer],
+        generator.names[chosen],
+        latency,
+        generator.category_of[question.answer],
+    ))
+    elapsed = time.perf_counter() - start
+    metrics.ANSWER_GRADE.observe(elapsed, mode)
+    metrics.ANSWERS.inc(mode, "correct" if correct else "wrong")
+    if latency is not None:
+        metrics.RESPONSE_TIME.observe(latency, mode)
+    return elapsed
 
-with col1:
+def render_question(question, mode):
+    start = time.perf_counter()
+    q = generator.render(question)
+    elapsed = time.perf_counter() - start
+    metrics.QUESTION_RENDER.observe(elapsed, mode)
+    return q, elapsed
+
+@st.fragment
+def case_panel():
     st.markdown("### 💡 Comprehensive Case Training")
     
+    mode = st.radio("Mode:", ["Practice", "Timed exam"], horizontal=True)
+    difficulty = st.selectbox(
+        "Distractor difficulty:", list(DIFFICULTY_LABELS), format_func=DIFFICULTY_LABELS.get
+    )
+    if mode == "Timed exam":
+        exam_panel(difficulty)
+    else:
+        practice_panel(difficulty)
+
+def practice_panel(difficulty):
+    st.session_state.case_pool.configure(difficulty=difficulty)
+    selection_mode = st.radio(
+        "Case selection:", ["Random", "Spaced repetition", "Weak categories", "Adaptive"], horizontal=True
+    )
+    if selection_mode == "Adaptive":
+        target = st.slider(
+            "Target success rate:", 0.4, 0.95, TARGET_SUCCESS, 0.05, format="%.2f",
+            help="Cases are picked so that you answer about this share correctly"
+        )
+    
     if st.button("🎯 Generate New Case", type="primary", use_container_width=True):
-        correct_dx = random.choice(list(diagnoses.keys()))
-        dx_info = diagnoses[correct_dx]
-        
-        symptoms = random.sample(dx_info["symptoms"], min(2, len(dx_info["symptoms"])))
-        question = f"A patient presents with **{', '.join(symptoms)}**. The most likely diagnosis is:"
-        
-        # Proper distractor selection for large database
-        possible_distractors = [dx for dx in diagnoses.keys() if dx != correct_dx]
-        num_distractors = min(3, len(possible_distractors))
-        distractors = random.sample(possible_distractors, num_distractors)
-        
-        options = [correct_dx] + distractors
-        random.shuffle(options)
-        
-        st.session_state.current_question = {
-            "question": question,
-            "options": options,
-            "correct_answer": correct_dx,
-            "explanation": f"**Key finding:** {dx_info['key_finding']}. **Urgency:** {dx_info['urgency']}",
-            "teaching_points": dx_info["teaching"],
-            "category": dx_info["category"]
-        }
-        st.rerun()
+        with metrics.QUESTION_GENERATE.time("practice"):
+            if selection_mode == "Random":
+                st.session_state.current_question = st.session_state.case_pool.next()
+            else:
+                category = None
+                if selection_mode == "Weak categories":
+                    category = scheduler.weak_category(store.summary(st.session_state.user_id).categories)
+                if selection_mode == "Adaptive":
+                    dx_id = adaptive.next(st.session_state.user_id, target)
+                else:
+                    dx_id = scheduler.next(st.session_state.user_id, category)
+                if dx_id < len(generator.names):
+                    st.session_state.current_question = st.session_state.case_pool.generate(
+                        1, answers=[dx_id], difficulty=difficulty
+                    )[0]
+                else:
+                    # Added by a reload that landed after this rerun took its engine
+                    st.session_state.current_question = st.session_state.case_pool.next()
+        st.session_state.question_shown_at = time.time()
+        st.session_state.submitted_answer = None
+        st.session_state.revealed_stages = 1
 
     if st.session_state.current_question:
-        q = st.session_state.current_question
+        question = st.session_state.current_question
+        q, _ = render_question(question, "practice")
+        submitted = st.session_state.submitted_answer
         
+        # The case unfolds a stage at a time (presentation, history,
+        # examination); all of it shows once answered
+        stages = q["stages"]
+        revealed = len(stages) if submitted is not None else st.session_state.revealed_stages
         st.markdown("#### 📋 Clinical Scenario")
-        st.info(f"{q['question']}")
-        st.caption(f"**Category:** {q['category']}")
+        st.info("\n\n".join(stages[:revealed] + [PROMPT]))
+        if revealed < len(stages):
+            st.button("🔎 Reveal Next Clue", on_click=reveal_stage)
+        caption = f"**Category:** {q['category']}"
+        if selection_mode == "Adaptive":
+            chance = adaptive.predict(st.session_state.user_id, question.answer)
+            caption += f" • **Predicted chance of success:** {chance:.0%}"
+        st.caption(caption)
         
-        selected_option = st.radio("**Select your diagnosis:**", q["options"])
+        # Options are diagnosis ids; only their names are rendered
+        selected_option = st.radio(
+            "**Select your diagnosis:**", question.options,
+            format_func=generator.names.__getitem__, disabled=submitted is not None
+        )
         
-        if st.button("🔍 Submit Diagnosis", type="secondary", use_container_width=True):
-            st.session_state.question_count += 1
-            if selected_option == q["correct_answer"]:
-                st.session_state.correct_count += 1
+        if st.button("🔍 Submit Diagnosis", type="secondary", use_container_width=True, disabled=submitted is not None):
+            shown_at = st.session_state.question_shown_at
+            grade(question, selected_option, "practice", time.time() - shown_at if shown_at else None)
+            st.session_state.submitted_answer = selected_option
+            st.rerun(scope="app")
+
+        if submitted is not None:
+            if submitted == question.answer:
                 st.success("### ✅ Correct Diagnosis!")
             else:
                 st.error(f"### ❌ The correct diagnosis is: **{q['correct_answer']}**")
-            
-            st.markdown("---")
-            st.markdown("#### 📖 Detailed Explanation")
-            st.markdown(q["explanation"])
-            
-            st.markdown("#### 🎓 Key Learning Points")
-            for i, point in enumerate(q["teaching_points"], 1):
-                st.markdown(f"{i}. {point}")
-
-with col2:
+            # Shared across sessions; one element instead of one per point
+            st.markdown(explanation_markdown(generator, question.answer))
+
+def reveal_stage():
+    st.session_state.revealed_stages += 1
+
+def countdown(deadline):
+    # Ticks in the browser, so a running exam costs the server no reruns;
+    # the deadline itself is enforced server-side when an answer comes in
+    import streamlit.components.v1 as components
+    components.html(f"""
+<div id="countdown" style="font: 600 1.4rem sans-serif; color: #1565C0;"></div>
+<script>
+const deadline = {deadline * 1000:.0f};
+const el = document.getElementById("countdown");
+function tick() {{
+    const left = Math.max(0, Math.round((deadline - Date.now()) / 1000));
+    el.textContent = left > 0
+        ? "⏱️ " + Math.floor(left / 60) + ":" + String(left % 60).padStart(2, "0") + " remaining"
+        : "⏱️ Time is up - submit to see your results";
+    if (left > 0) setTimeout(tick, 500);
+}}
+tick();
+</script>
+""", height=45)
+
+def clear_exam():
+    st.session_state.exam = None
+
+def exam_panel(difficulty):
+    exam = st.session_state.exam
+    if exam is None:
+        length = st.selectbox(
+            "Exam length:", EXAM_LENGTHS,
+            format_func=lambda n: f"{n} questions ({n * SECONDS_PER_QUESTION // 60} min)"
+        )
+        st.caption("Answers are graded at the end. Unanswered questions count as wrong when time runs out.")
+        if not st.button("⏱️ Start Timed Exam", type="primary", use_container_width=True):
+            return
+        start = time.perf_counter()
+        questions = st.session_state.case_pool.generate(length, difficulty=difficulty)
+        elapsed = time.perf_counter() - start
+        # One sample per question, as in practice mode, at the batch's mean
+        metrics.QUESTION_GENERATE.observe(elapsed / length, "exam", count=length)
+        exam = st.session_state.exam = Exam(questions, length * SECONDS_PER_QUESTION, elapsed)
+        metrics.EXAMS.inc("started")
+
+    if not exam.finished():
+        question = exam.current
+        if not generator.is_current(question):
+            # The knowledge base was edited under this question
+            exam.replace_current(st.session_state.case_pool.generate(1, difficulty=difficulty)[0])
+            question = exam.current
+        q, render_seconds = render_question(question, "exam")
+        exam.shown(render_seconds)
+        
+        countdown(exam.deadline)
+        st.markdown(f"#### 📋 Question {len(exam.answers) + 1} of {len(exam)}")
+        st.info(f"{q['question']}")
+        selected_option = st.radio(
+            "**Select your diagnosis:**", question.options,
+            format_func=generator.names.__getitem__, key=f"exam_answer_{len(exam.answers)}"
+        )
+        if st.button("➡️ Submit Answer", type="primary", use_container_width=True):
+            if not exam.finished():
+                latency = time.time() - exam.shown_at
+                exam.answer(selected_option, grade(question, selected_option, "exam", latency))
+            st.rerun(scope="app")
+        return
+
+    if exam.close():
+        metrics.EXAMS.inc("expired" if exam.expired else "completed")
+    st.markdown("#### 🏁 Exam Results")
+    if exam.expired:
+        st.warning(f"Time ran out with {len(exam) - len(exam.answers)} questions unanswered.")
+    st.metric("Score", f"{exam.correct} / {len(exam)}", f"{exam.correct / len(exam) * 100:.0f}%", delta_color="off")
+    rows = []
+    for i, question in enumerate(exam.questions):
+        answered = i < len(exam.answers)
+        response, generate_s, render_s, grade_s = exam.timings[i] if answered else (None,) * 4
+        rows.append({
+            "#": i + 1,
+            "Correct answer": generator.names[question.answer],
+            "Your answer": generator.names[exam.answers[i]] if answered else "-",
+            "Result": ("✅" if exam.answers[i] == question.answer else "❌") if answered else "⏱️",
+            "Response (s)": round(response, 1) if answered else None,
+            "Generate (ms)": round(generate_s * 1000, 3) if answered else None,
+            "Render (ms)": round(render_s * 1000, 3) if answered else None,
+            "Grade (ms)": round(grade_s * 1000, 3) if answered else None,
+        })
+    st.dataframe(rows, hide_index=True, use_container_width=True)
+    st.button("🔁 New Exam", on_click=clear_exam, use_container_width=True)
+
+EXPLORER_PAGE_SIZES = [10, 25, 50, 100]
+
+def toggle_explorer_row(dx):
+    st.session_state.explorer_open ^= {dx}
+
+def explorer_row(dx, show_category=False):
+    # Details are only built for rows a trainee has opened, so the page
+    # payload stays bounded by the page size
+    is_open = dx in st.session_state.explorer_open
+    st.button(
+        f"{'▾' if is_open else '▸'} {dx}", key=f"explorer_row_{dx}",
+        on_click=toggle_explorer_row, args=(dx,), use_container_width=True
+    )
+    if is_open:
+        info = diagnoses[dx]
+        details = [f"**Urgency:** {info['urgency']}", f"**Key finding:** {info['key_finding']}"]
+        if show_category:
+            details.insert(0, f"**Category:** {info['category']}")
+        teaching = "\n".join(f"- {point}" for point in info["teaching"])
+        st.markdown("\n\n".join(details) + "\n\n" + teaching)
+
+@st.fragment
+def specialty_explorer():
     st.markdown("### 🏥 Specialty Explorer")
     
+    query = st.text_input("Search diagnoses:", placeholder="e.g. cherry red spot, diplopia, halos")
     selected_category = st.selectbox("Filter by specialty:", ["All"] + list(categories.keys()))
     
-    if selected_category == "All":
+    if query.strip():
+        results = engine.search.search(query, category=None if selected_category == "All" else selected_category)
+        st.write(f"**{len(results)} matching diagnoses:**" if results else "No matching diagnoses.")
+        for dx, _ in results:
+            explorer_row(dx, show_category=True)
+    elif selected_category == "All":
         st.write(f"**All {total_diagnoses} diagnoses available**")
         for category, count in sorted(categories.items()):
             with st.expander(f"{category} ({count} diagnoses)"):
-                category_dx = [dx for dx, info in diagnoses.items() if info["category"] == category]
+                category_dx = kb.in_category(category)
                 for dx in category_dx[:5]:  # Show first 5
                     st.write(f"• {dx}")
                 if len(category_dx) > 5:
                     st.write(f"• ... and {len(category_dx) - 5} more")
     else:
-        st.write(f"**{selected_category} diagnoses:**")
-        category_dx = [dx for dx, info in diagnoses.items() if info["category"] == selected_category]
-        for dx in category_dx:
-            with st.expander(dx):
-                info = diagnoses[dx]
-                st.write(f"**Urgency:** {info['urgency']}")
-                st.write(f"**Key finding:** {info['key_finding']}")
+        category_dx = kb.in_category(selected_category)
+        page_size = st.selectbox("Diagnoses per page:", EXPLORER_PAGE_SIZES, key="explorer_page_size")
+        pages = max(1, math.ceil(len(category_dx) / page_size))
+        page_key = f"explorer_page_{selected_category}"
+        if st.session_state.get(page_key, 1) > pages:
+            st.session_state[page_key] = pages
+        page = st.number_input("Page:", min_value=1, max_value=pages, key=page_key) if pages > 1 else 1
+        start = (page - 1) * page_size
+        page_dx = category_dx[start:start + page_size]
+        
+        st.write(f"**{selected_category} diagnoses** ({start + 1}-{start + len(page_dx)} of {len(category_dx)}):")
+        for dx in page_dx:
+            explorer_row(dx)
+
+# ===== PAGE LAYOUT =====
+static_html = get_static_html(kb, kb.version)
+
+# Comprehensive header
+st.markdown(static_html["header"], unsafe_allow_html=True)
+
+# Sidebar with comprehensive database info
+with st.sidebar:
+    view = "Trainer"
+    if ANALYTICS_KEY:
+        view = st.radio("View:", ["Trainer", "Cohort analytics"], horizontal=True)
+    if view == "Cohort analytics" and not st.session_state.analytics_unlocked:
+        key = st.text_input("Analytics key:", type="password")
+        if key and hmac.compare_digest(key.encode(), ANALYTICS_KEY.encode()):
+            st.session_state.analytics_unlocked = True
+    st.markdown("### 🏥 Database Overview")
+    # A bad push to the data files keeps the previous knowledge base live;
+    # say so, with the reason, until a reload succeeds
+    reload_error = get_watcher().last_error
+    if reload_error:
+        st.warning(f"Knowledge base update not applied, showing the previous version: {reload_error}")
+    st.metric("Total Diagnoses", total_diagnoses)
+    st.metric("Medical Specialties", len(categories))
+    
+    st.markdown("### 📊 Specialty Distribution")
+    st.markdown(static_html["distribution"])
+    
+    progress_panel()
+
+# Main app content
+if view == "Cohort analytics":
+    if st.session_state.analytics_unlocked:
+        # numpy aggregation and the charts are only loaded when someone looks
+        import analytics_page
+        analytics_page.render(store, kb)
+    else:
+        st.info("Enter the analytics key in the sidebar to open the cohort view.")
+else:
+    col1, col2 = st.columns([2, 1])
+
+    with col1:
+        case_panel()
+
+    with col2:
+        specialty_explorer()
 
 # Comprehensive footer
 st.markdown("---")
-st.markdown(f"""
-<div style="text-align: center; color: #666; padding: 2rem;">
-    <p><strong>Comprehensive Ophthalmology AI Trainer</strong> • {total_diagnoses} Diagnoses • {len(categories)} Specialties</p>
-    <p><small>Professional medical education platform for ophthalmology training</small></p>
-</div>
-""", unsafe_allow_html=True)
+st.markdown(static_html["footer"], unsafe_allow_html=True)
@@ -0,0 +1,65 @@
+import argparse
+import sys
+
+from benchmarks import bench_analytics, bench_engine, bench_startup
+from benchmarks.harness import compare_results, print_table, write_results
+
+# ===== BENCHMARK RUNNER =====
+# python -m benchmarks [--suite engine app analytics startup] [--sizes 50 1000 ...]
+#                      [--output bench_results.json] [--compare baseline.json]
+
+DEFAULT_ENGINE_SIZES = [50, 1000, 10_000, 100_000]
+# 0 stands for the bundled knowledge base in the app suite
+DEFAULT_APP_SIZES = [0, 1000]
+# Answer events in the analytics suite
+DEFAULT_ANALYTICS_SIZES = [100_000, 1_000_000]
+# Cold-start suite, 0 = bundled
+DEFAULT_STARTUP_SIZES = [0, 1000, 10_000]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Ophthalmology AI Trainer benchmarks")
+    parser.add_argument("--suite", nargs="+", choices=["engine", "app", "analytics", "startup"], default=["engine", "app"])
+    parser.add_argument("--sizes", nargs="+", type=int, help="engine knowledge-base sizes")
+    parser.add_argument("--app-sizes", nargs="+", type=int, help="app knowledge-base sizes (0 = bundled)")
+    parser.add_argument("--events", nargs="+", type=int, help="analytics answer-event counts")
+    parser.add_argument("--startup-sizes", nargs="+", type=int, help="cold-start knowledge-base sizes (0 = bundled)")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--max-index-size", type=int, default=bench_engine.MAX_INDEX_SIZE)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", metavar="BASELINE", help="fail if any p50 regresses past --threshold")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    args = parser.parse_args(argv)
+
+    results = []
+    if "engine" in args.suite:
+        results.extend(bench_engine.run(args.sizes or DEFAULT_ENGINE_SIZES, args.repeat, args.max_index_size))
+    if "app" in args.suite:
+        # Imported lazily so the engine suite runs without Streamlit installed
+        from benchmarks import bench_app
+        app_sizes = [size or None for size in (args.app_sizes or DEFAULT_APP_SIZES)]
+        results.extend(bench_app.run(app_sizes, max(1, args.repeat // 2)))
+    if "analytics" in args.suite:
+        results.extend(bench_analytics.run(args.events or DEFAULT_ANALYTICS_SIZES, args.repeat))
+    if "startup" in args.suite:
+        startup_sizes = [size or None for size in (args.startup_sizes or DEFAULT_STARTUP_SIZES)]
+        results.extend(bench_startup.run(startup_sizes, max(1, args.repeat // 4)))
+
+    print_table(results)
+    write_results(args.output, results)
+    print(f"\nWrote {len(results)} results to {args.output}")
+
+    if args.compare:
+        regressions = compare_results(args.compare, results, args.threshold)
+        for record, before, ratio in regressions:
+            print(
+                f"REGRESSION {record['suite']}/{record['name']} size={record['size']}: "
+                f"{before['p50_ms']:.3f} -> {record['p50_ms']:.3f} ms ({ratio:.2f}x)"
+            )
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
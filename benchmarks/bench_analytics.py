@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from analytics import AnswerRollup
+from benchmarks.harness import measure, timing_record
+from knowledge_base import load_knowledge_base
+from progress import SQLiteProgressStore
+
+# ===== COHORT ANALYTICS BENCHMARKS =====
+# Fills a scratch SQLite progress store with synthetic answer events from a
+# cohort of trainees over the bundled knowledge base, then times loading the
+# rollup and each dashboard view. The size is the number of events.
+
+SUITE = "analytics"
+TRAINEES = 500
+INGEST_BATCH = 10_000
+
+
+def synthetic_events(n, kb, seed=0):
+    rng = np.random.default_rng(seed)
+    names = list(kb.diagnoses)
+    answers = rng.integers(0, len(names), size=n)
+    # About 70% correct; wrong picks favour a few distractors per diagnosis
+    wrong = rng.random(n) > 0.7
+    chosen = np.where(wrong, (answers + rng.geometric(0.4, size=n)) % len(names), answers)
+    users = rng.integers(0, TRAINEES, size=n)
+    latencies = rng.gamma(2.0, 8.0, size=n)
+    for i in range(n):
+        dx = names[answers[i]]
+        yield {
+            "user_id": f"pgy{users[i] % 5 + 1}-{users[i]:04d}",
+            "diagnosis": dx,
+            "chosen": names[chosen[i]],
+            "correct": answers[i] == chosen[i],
+            "latency": float(latencies[i]),
+            "category": kb[dx]["category"],
+            "answered_at": float(i),
+        }
+
+
+def run(sizes, repeat=20):
+    kb = load_knowledge_base()
+    results = []
+    for size in sizes:
+        tmp = tempfile.mkdtemp(prefix="trainer-analytics-")
+        store = SQLiteProgressStore(os.path.join(tmp, "progress.db"))
+        try:
+            # Batches go straight to the backend, as the writer thread would send them
+            samples = []
+            batch = []
+            for event in synthetic_events(size, kb):
+                batch.append(event)
+                if len(batch) == INGEST_BATCH:
+                    start = time.perf_counter()
+                    store._write_batch(batch)
+                    samples.append((time.perf_counter() - start) * 1000)
+                    batch = []
+            if batch:
+                store._write_batch(batch)
+            if samples:
+                results.append(timing_record(SUITE, f"ingest_batch_{INGEST_BATCH}", samples, size))
+
+            results.append(measure(SUITE, "load_rollup", lambda: AnswerRollup.from_store(store), size, repeat))
+            rollup = AnswerRollup.from_store(store)
+            results.append(measure(SUITE, "totals", rollup.totals, size, repeat))
+            results.append(measure(SUITE, "by_category", lambda: rollup.by_name("categories", "c"), size, repeat))
+            results.append(measure(SUITE, "by_urgency", lambda: rollup.by_urgency(kb), size, repeat))
+            results.append(measure(SUITE, "by_diagnosis", lambda: rollup.by_name("diagnoses", "d"), size, repeat))
+            results.append(measure(SUITE, "by_trainee", lambda: rollup.by_name("users", "u"), size, repeat))
+            results.append(measure(SUITE, "confusions", rollup.confusions, size, repeat))
+            category = next(iter(kb.categories))
+            results.append(measure(
+                SUITE, "confusion_matrix", lambda: rollup.confusion_matrix(kb.in_category(category)), size, repeat
+            ))
+            results.append(measure(SUITE, "cohort_filter", lambda: rollup.cohort("pgy2-").totals(), size, repeat))
+
+            def dashboard():
+                loaded = AnswerRollup.from_store(store)
+                loaded.totals()
+                loaded.by_name("categories", "c")
+                loaded.by_urgency(kb)
+                loaded.by_name("diagnoses", "d")
+                loaded.by_name("users", "u")
+                loaded.confusions()
+                loaded.confusion_matrix(kb.in_category(category))
+
+            results.append(measure(SUITE, "full_dashboard", dashboard, size, max(1, repeat // 4)))
+        finally:
+            store.close()
+            shutil.rmtree(tmp, ignore_errors=True)
+    return results
@@ -0,0 +1,129 @@
+import atexit
+import os
+import shutil
+import tempfile
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.harness import deep_sizeof, measure, measure_once, timing_record
+from benchmarks.synthetic import write_synthetic_knowledge_base
+from cases import CaseGenerator
+from distractors import DistractorIndex
+from knowledge_base import KnowledgeBase
+from search import SearchIndex
+
+# ===== FULL-RERUN BENCHMARKS =====
+# Drives app.py headlessly through AppTest and times complete script reruns
+# for the main interactions. A size of None means the bundled knowledge base.
+# AppTest always reruns the whole script, fragments included, so these are
+# worst-case numbers; in a live session most clicks only rerun one fragment.
+
+SUITE = "app"
+# Cached once per process and shared by every session
+SHARED_TYPES = (CaseGenerator, DistractorIndex, KnowledgeBase, SearchIndex)
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+TIMEOUT = 120
+
+
+def _button(at, label):
+    for button in at.button:
+        if label in button.label:
+            return button
+    raise LookupError(f"No button labelled {label!r}")
+
+
+def _selectbox(at, label):
+    for selectbox in at.selectbox:
+        if label in selectbox.label:
+            return selectbox
+    raise LookupError(f"No selectbox labelled {label!r}")
+
+
+def _run(at):
+    at.run(timeout=TIMEOUT)
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+
+
+def run(sizes, repeat=10):
+    # Progress stores opened by the app flush on exit, so the scratch
+    # directory is removed by an atexit hook registered before any of them
+    tmp = tempfile.mkdtemp(prefix="trainer-bench-")
+    atexit.register(shutil.rmtree, tmp, ignore_errors=True)
+    results = []
+    for size in sizes:
+        label = "bundled" if size is None else str(size)
+        env = {
+            "TRAINER_PROGRESS_BACKEND": "file",
+            "TRAINER_PROGRESS_PATH": os.path.join(tmp, f"progress-{label}.jsonl"),
+        }
+        if size is not None:
+            env["TRAINER_KB_PATH"] = write_synthetic_knowledge_base(os.path.join(tmp, f"kb-{label}"), size)
+        saved = {key: os.environ.get(key) for key in env}
+        os.environ.update(env)
+        st.cache_resource.clear()
+        try:
+            results.extend(_run_flows(size, repeat))
+        finally:
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+            st.cache_resource.clear()
+    return results
+
+
+def _run_flows(size, repeat):
+    results = []
+    at = AppTest.from_file(APP_PATH, default_timeout=TIMEOUT)
+    record, _ = measure_once(SUITE, "cold_start", lambda: _run(at), size)
+    results.append(record)
+    results.append(measure(SUITE, "idle_rerun", lambda: _run(at), size, repeat))
+
+    def generate():
+        _button(at, "Generate New Case").click()
+        _run(at)
+
+    def submit():
+        _button(at, "Submit Diagnosis").click()
+        _run(at)
+
+    results.append(measure(SUITE, "generate", generate, size, repeat))
+    # Each submit needs a fresh case, so only the submit rerun is timed
+    submit_samples = []
+    for _ in range(repeat):
+        generate()
+        record, _ = measure_once(SUITE, "submit", submit, size)
+        submit_samples.append(record["p50_ms"])
+    results.append(timing_record(SUITE, "submit", submit_samples, size))
+
+    results.append(session_state_record(at, size))
+
+    categories = [option for option in _selectbox(at, "Filter by specialty").options if option != "All"]
+    state = {"i": 0}
+
+    def filter_category():
+        state["i"] += 1
+        _selectbox(at, "Filter by specialty").select(categories[state["i"] % len(categories)])
+        _run(at)
+
+    results.append(measure(SUITE, "category_filter", filter_category, size, repeat))
+
+    def reset():
+        _button(at, "Reset Progress").click()
+        _run(at)
+
+    results.append(measure(SUITE, "reset", reset, size, repeat))
+    return results
+
+
+def session_state_record(at, size):
+    # Per-session memory held in st.session_state after a generate + submit
+    state = at.session_state.to_dict()
+    per_key = {key: deep_sizeof(value, SHARED_TYPES) for key, value in state.items()}
+    return {
+        "suite": SUITE, "name": "session_state_bytes", "size": size,
+        "bytes": sum(per_key.values()), "per_key": per_key,
+    }
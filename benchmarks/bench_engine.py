@@ -0,0 +1,96 @@
+import numpy as np
+
+from adaptive import AdaptiveModel
+from benchmarks.harness import measure, measure_once
+from benchmarks.synthetic import synthetic_diagnoses
+from cases import CaseGenerator, CasePool, SeenStems
+from distractors import DIFFICULTIES, DistractorIndex
+from explanations import _render, explanation_markdown
+from hot_reload import Engine, update_engine
+from knowledge_base import KnowledgeBase
+from search import SearchIndex
+
+# ===== ENGINE MICROBENCHMARKS =====
+# Case generation and distractor selection, without Streamlit in the loop.
+
+SUITE = "engine"
+BATCH_SIZE = 1000
+# Building the all-pairs similarity index is quadratic; above this size it
+# is skipped and cases fall back to uniform distractors.
+MAX_INDEX_SIZE = 10_000
+
+
+def run(sizes, repeat=20, max_index_size=MAX_INDEX_SIZE):
+    results = []
+    for size in sizes:
+        diagnoses = synthetic_diagnoses(size)
+        record, kb = measure_once(SUITE, "build_knowledge_base", lambda: KnowledgeBase(diagnoses), size)
+        results.append(record)
+
+        distractors = None
+        if size <= max_index_size:
+            record, distractors = measure_once(SUITE, "build_distractor_index", lambda: DistractorIndex(kb), size)
+            results.append(record)
+        else:
+            results.append({"suite": SUITE, "name": "build_distractor_index", "size": size,
+                            "skipped": f"size above --max-index-size {max_index_size}"})
+
+        record, generator = measure_once(SUITE, "build_case_generator", lambda: CaseGenerator(kb, distractors), size)
+        results.append(record)
+
+        difficulty = "near" if distractors is not None else None
+        results.append(measure(SUITE, "generate_case", lambda: generator.generate(1, difficulty=difficulty), size, repeat))
+        results.append(measure(
+            SUITE, f"generate_batch_{BATCH_SIZE}",
+            lambda: generator.generate(BATCH_SIZE, difficulty=difficulty), size, repeat,
+        ))
+        results.append(measure(
+            SUITE, f"generate_batch_{BATCH_SIZE}_unique",
+            lambda: generator.generate(BATCH_SIZE, difficulty=difficulty, seen=SeenStems()), size, repeat,
+        ))
+        batch = generator.generate(BATCH_SIZE, seed=0, difficulty=difficulty)
+        results.append(measure(
+            SUITE, f"render_batch_{BATCH_SIZE}", lambda: list(generator.questions(batch)), size, repeat,
+        ))
+
+        # Post-answer explanation block: rendered vs from the shared cache
+        dx_info = kb[generator.names[0]]
+        results.append(measure(SUITE, "explanation_render", lambda: _render(dx_info), size, repeat * 10))
+        results.append(measure(
+            SUITE, "explanation_cached", lambda: explanation_markdown(generator, 0), size, repeat * 10,
+        ))
+
+        # Adaptive difficulty: the Submit-path update and one targeted pick
+        model = AdaptiveModel(generator.category_of, seed=0)
+        results.append(measure(SUITE, "adaptive_record", lambda: model.record("bench", 0, True), size, repeat * 10))
+        results.append(measure(SUITE, "adaptive_next", lambda: model.next("bench"), size, repeat * 10))
+
+        pool = CasePool(generator, difficulty=difficulty)
+        results.append(measure(SUITE, "case_pool_next", pool.next, size, repeat * 10))
+
+        record, search_index = measure_once(SUITE, "build_search_index", lambda: SearchIndex(kb), size)
+        results.append(record)
+        # Uncached lookups: exact terms, a prefix still being typed, a typo
+        for label, query in (("exact", "finding1 finding2"), ("prefix", "finding1"), ("fuzzy", "fnding12")):
+            results.append(measure(SUITE, f"search_{label}", lambda: search_index._search(query), size, repeat))
+
+        if distractors is not None:
+            # Hot reload after one diagnosis was edited
+            name = next(iter(diagnoses))
+            edited = dict(diagnoses)
+            edited[name] = dict(diagnoses[name], key_finding=diagnoses[name]["key_finding"] + " revised")
+            engine = Engine(kb, generator, search_index)
+            results.append(measure(SUITE, "reload_one_edit", lambda: update_engine(engine, edited), size, repeat))
+
+            rng = np.random.default_rng(0)
+            answers = rng.integers(0, size, size=BATCH_SIZE)
+            for level in DIFFICULTIES:
+                results.append(measure(
+                    SUITE, f"distractors_{level}", lambda: distractors.sample(answers[:1], 3, rng, level),
+                    size, repeat * 10,
+                ))
+                results.append(measure(
+                    SUITE, f"distractors_{level}_batch_{BATCH_SIZE}",
+                    lambda: distractors.sample(answers, 3, rng, level), size, repeat,
+                ))
+    return results
@@ -0,0 +1,58 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.harness import timing_record
+from benchmarks.synthetic import write_synthetic_knowledge_base
+
+# ===== COLD START BENCHMARKS =====
+# Times fresh Python processes, as a new worker would start: importing the
+# app's own modules, and getting a ready engine either by building it from
+# the data files or by loading the precompiled snapshot. A size of None
+# means the bundled knowledge base.
+
+SUITE = "startup"
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORTS = "import cases, exam, hot_reload, metrics, progress, scheduler, search, snapshot"
+LOAD_ENGINE = "import snapshot; snapshot.load_engine()"
+
+
+def _cold(code, env, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def run(sizes, repeat=5):
+    tmp = tempfile.mkdtemp(prefix="trainer-startup-")
+    results = []
+    try:
+        baseline = _cold("pass", dict(os.environ), repeat)
+        results.append(timing_record(SUITE, "interpreter", baseline))
+        results.append(timing_record(SUITE, "import_modules", _cold(IMPORTS, dict(os.environ), repeat)))
+        for size in sizes:
+            label = "bundled" if size is None else str(size)
+            env = dict(os.environ)
+            if size is not None:
+                env["TRAINER_KB_PATH"] = write_synthetic_knowledge_base(os.path.join(tmp, f"kb-{label}"), size)
+            record_size = size or 0
+
+            env["TRAINER_KB_SNAPSHOT"] = "off"
+            results.append(timing_record(SUITE, "engine_from_source", _cold(LOAD_ENGINE, env, repeat), record_size))
+
+            # The first run writes the snapshot, the rest load it
+            env["TRAINER_KB_SNAPSHOT"] = os.path.join(tmp, f"snapshot-{label}.pickle")
+            _cold(LOAD_ENGINE, env, 1)
+            results.append(timing_record(
+                SUITE, "engine_from_snapshot", _cold(LOAD_ENGINE, env, repeat), record_size,
+                snapshot_kb=os.path.getsize(env["TRAINER_KB_SNAPSHOT"]) // 1024,
+            ))
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return results
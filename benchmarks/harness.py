@@ -0,0 +1,129 @@
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+# ===== TIMING HARNESS =====
+# Every benchmark produces one flat record: suite, name, size, plus timing
+# statistics in milliseconds. Records are keyed by (suite, name, size) so two
+# result files can be compared entry by entry.
+
+
+def measure(suite, name, fn, size=None, repeat=20, warmup=2, **extra):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return timing_record(suite, name, samples, size, **extra)
+
+
+def measure_once(suite, name, fn, size=None, **extra):
+    # For one-off costs such as loading or index builds; returns (record, result)
+    start = time.perf_counter()
+    result = fn()
+    return timing_record(suite, name, [(time.perf_counter() - start) * 1000], size, **extra), result
+
+
+def timing_record(suite, name, samples, size=None, **extra):
+    ordered = sorted(samples)
+    record = {
+        "suite": suite,
+        "name": name,
+        "size": size,
+        "repeat": len(samples),
+        "mean_ms": statistics.fmean(samples),
+        "min_ms": ordered[0],
+        "p50_ms": percentile(ordered, 50),
+        "p95_ms": percentile(ordered, 95),
+        "max_ms": ordered[-1],
+    }
+    record.update(extra)
+    return record
+
+
+def percentile(ordered, pct):
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def deep_sizeof(obj, shared_types=(), seen=None):
+    # Approximate bytes reachable from obj, not counting instances of
+    # shared_types (process-wide objects such as the knowledge base)
+    seen = set() if seen is None else seen
+    if id(obj) in seen or isinstance(obj, shared_types):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, shared_types, seen) + deep_sizeof(v, shared_types, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, shared_types, seen) for item in obj)
+    elif hasattr(obj, "__dict__") and not isinstance(obj, type):
+        size += deep_sizeof(vars(obj), shared_types, seen)
+    elif hasattr(obj, "__slots__"):
+        size += sum(deep_sizeof(getattr(obj, name), shared_types, seen)
+                    for name in obj.__slots__ if hasattr(obj, name))
+    return size
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path, results):
+    payload = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+        f.write("\n")
+
+
+def compare_results(baseline_path, results, threshold=1.25, metric="p50_ms"):
+    # Returns the records that got slower than `threshold` x the baseline
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {
+            (r["suite"], r["name"], r["size"]): r for r in json.load(f)["results"]
+        }
+    regressions = []
+    for record in results:
+        before = baseline.get((record["suite"], record["name"], record["size"]))
+        if before and before.get(metric) and record.get(metric) is not None:
+            ratio = record[metric] / before[metric]
+            if ratio > threshold:
+                regressions.append((record, before, ratio))
+    return regressions
+
+
+def print_table(results):
+    for r in results:
+        size = "" if r["size"] is None else r["size"]
+        if r.get("skipped"):
+            print(f"{r['suite']:<8} {r['name']:<32} {size!s:>8}  skipped: {r['skipped']}")
+            continue
+        if "bytes" in r:
+            print(f"{r['suite']:<8} {r['name']:<32} {size!s:>8}  {r['bytes'] / 1024:9.1f} KB")
+            continue
+        p99 = f"  p99 {r['p99_ms']:9.3f} ms" if "p99_ms" in r else ""
+        print(
+            f"{r['suite']:<8} {r['name']:<32} {size!s:>8}  "
+            f"p50 {r['p50_ms']:9.3f} ms  p95 {r['p95_ms']:9.3f} ms{p99}  (n={r['repeat']})"
+        )
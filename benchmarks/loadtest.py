@@ -0,0 +1,302 @@
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from benchmarks.harness import print_table, timing_record, write_results
+
+# ===== MULTI-SESSION LOAD TEST =====
+# Starts app.py under a real `streamlit run` server (or targets one already
+# running via --url) and drives N concurrent sessions over the same websocket
+# protocol the browser uses: each session loops generate -> answer -> submit.
+# Every action is a BackMsg rerun request; its latency is the time until the
+# server reports the script (or fragment) run finished.
+#
+# Server CPU and memory are read from /proc for the server process, so those
+# numbers are only reported on Linux and only for servers this tool started.
+#
+# python -m benchmarks.loadtest --sessions 50 --duration 60 [--think-time 1.0]
+
+SUITE = "load"
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+GENERATE_LABEL = "Generate New Case"
+ANSWER_LABEL = "Select your diagnosis"
+SUBMIT_LABEL = "Submit Diagnosis"
+STARTUP_TIMEOUT = 60
+ACTION_TIMEOUT = 60
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# ----- server process -----
+
+class LocalServer:
+    def __init__(self, port=None, env=None):
+        self.port = port or _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.tmp = tempfile.mkdtemp(prefix="trainer-load-")
+        self.env = dict(os.environ)
+        self.env.setdefault("TRAINER_PROGRESS_BACKEND", "sqlite")
+        self.env.setdefault("TRAINER_PROGRESS_PATH", os.path.join(self.tmp, "progress.db"))
+        self.env.update(env or {})
+        self.process = None
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [
+                sys.executable, "-m", "streamlit", "run", APP_PATH,
+                "--server.headless", "true",
+                "--server.port", str(self.port),
+                "--server.address", "127.0.0.1",
+                "--browser.gatherUsageStats", "false",
+            ],
+            env=self.env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"streamlit exited with code {self.process.returncode}")
+            try:
+                with urllib.request.urlopen(f"{self.url}/_stcore/health", timeout=1) as response:
+                    if response.status == 200:
+                        return self
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError("streamlit server did not become healthy in time")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def usage(self):
+        # (rss bytes, cpu seconds) for the server, or (None, None) off Linux
+        if self.process is None:
+            return None, None
+        try:
+            with open(f"/proc/{self.process.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+            with open(f"/proc/{self.process.pid}/statm") as f:
+                rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+            return rss, cpu
+        except (OSError, ValueError, IndexError):
+            return None, None
+
+
+# ----- protocol client -----
+
+class Session:
+    # One simulated browser tab speaking Streamlit's websocket protocol
+    def __init__(self, url, rng):
+        self.ws_url = url.replace("http", "ws", 1) + "/_stcore/stream"
+        self.rng = rng
+        self.ws = None
+        self.widgets = {}  # label -> (element type, element proto, fragment id)
+        self.errors = []
+
+    async def connect(self):
+        import websockets
+
+        self.ws = await websockets.connect(self.ws_url, subprotocols=["streamlit"], max_size=None)
+        return await self.rerun()
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    def find(self, label):
+        for widget_label, widget in self.widgets.items():
+            if label in widget_label:
+                return widget
+        return None
+
+    async def rerun(self, widget_states=(), fragment_id=""):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.page_script_hash = ""
+        msg.rerun_script.fragment_id = fragment_id
+        msg.rerun_script.widget_states.widgets.extend(widget_states)
+
+        start = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        done = {
+            ForwardMsg.FINISHED_SUCCESSFULLY,
+            ForwardMsg.FINISHED_WITH_COMPILE_ERROR,
+            ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY,
+        }
+        while True:
+            data = await asyncio.wait_for(self.ws.recv(), ACTION_TIMEOUT)
+            forward = ForwardMsg()
+            forward.ParseFromString(data)
+            kind = forward.WhichOneof("type")
+            if kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                element = forward.delta.new_element
+                element_type = element.WhichOneof("type")
+                if element_type == "exception":
+                    self.errors.append(element.exception.message)
+                elif hasattr(getattr(element, element_type), "id") and hasattr(getattr(element, element_type), "label"):
+                    widget = getattr(element, element_type)
+                    self.widgets[widget.label] = (element_type, widget, forward.delta.fragment_id)
+            elif kind == "script_finished" and forward.script_finished in done:
+                return (time.perf_counter() - start) * 1000
+
+    async def click(self, label, extra_states=()):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        widget = self.find(label)
+        if widget is None:
+            raise LookupError(f"No widget labelled {label!r}")
+        _, button, fragment_id = widget
+        trigger = WidgetState(id=button.id, trigger_value=True)
+        return await self.rerun([trigger, *extra_states], fragment_id)
+
+    def choose_answer(self):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+        widget = self.find(ANSWER_LABEL)
+        if widget is None:
+            return None, ""
+        _, radio, fragment_id = widget
+        index = self.rng.randrange(len(radio.options))
+        # Newer Streamlit sends radio values as strings, older as indexes
+        if "raw_value" in radio.DESCRIPTOR.fields_by_name:
+            return WidgetState(id=radio.id, string_value=radio.options[index]), fragment_id
+        return WidgetState(id=radio.id, int_value=index), fragment_id
+
+
+async def _session_loop(session, deadline, think_time, latencies):
+    async def think():
+        if think_time:
+            await asyncio.sleep(session.rng.uniform(0, 2 * think_time))
+
+    try:
+        latencies["connect"].append(await session.connect())
+        while time.monotonic() < deadline:
+            latencies["generate"].append(await session.click(GENERATE_LABEL))
+            await think()
+            answer, fragment_id = session.choose_answer()
+            if answer is not None:
+                latencies["answer"].append(await session.rerun([answer], fragment_id))
+                await think()
+            latencies["submit"].append(await session.click(SUBMIT_LABEL, [answer] if answer else []))
+            await think()
+    except Exception as exc:
+        session.errors.append(repr(exc))
+    finally:
+        await session.close()
+
+
+async def _run_sessions(url, sessions, duration, think_time, seed):
+    latencies = {"connect": [], "generate": [], "answer": [], "submit": []}
+    deadline = time.monotonic() + duration
+    clients = [Session(url, random.Random(seed + i)) for i in range(sessions)]
+    await asyncio.gather(*(_session_loop(c, deadline, think_time, latencies) for c in clients))
+    errors = [error for c in clients for error in c.errors]
+    return latencies, errors
+
+
+def run(sessions, duration, think_time=0.5, url=None, seed=0):
+    server = None
+    if url is None:
+        server = LocalServer().start()
+        url = server.url
+    try:
+        # One warm-up session loads the knowledge base and cached indexes, so
+        # the memory baseline excludes process-wide state
+        asyncio.run(_run_sessions(url, 1, 0, 0, seed))
+        rss_before, cpu_before = server.usage() if server else (None, None)
+        wall_start = time.monotonic()
+        latencies, errors = asyncio.run(_run_sessions(url, sessions, duration, think_time, seed + 1))
+        wall = time.monotonic() - wall_start
+        rss_after, cpu_after = server.usage() if server else (None, None)
+    finally:
+        if server:
+            server.stop()
+
+    results = []
+    all_samples = []
+    for action, samples in latencies.items():
+        if samples:
+            results.append(_load_record(action, samples, sessions))
+            if action != "connect":
+                all_samples.extend(samples)
+    if all_samples:
+        results.append(_load_record("rerun", all_samples, sessions))
+
+    summary = {
+        "suite": SUITE, "name": "server", "size": sessions,
+        "duration_s": wall,
+        "reruns": len(all_samples),
+        "reruns_per_s": len(all_samples) / wall if wall else None,
+        "errors": len(errors),
+        "error_samples": errors[:5],
+    }
+    if rss_before is not None and rss_after is not None:
+        summary["rss_mb"] = rss_after / 2**20
+        summary["rss_per_session_kb"] = (rss_after - rss_before) / sessions / 1024
+        cpu = cpu_after - cpu_before
+        summary["cpu_s"] = cpu
+        summary["cpu_utilization"] = cpu / wall if wall else None
+        summary["cpu_ms_per_rerun"] = cpu * 1000 / len(all_samples) if all_samples else None
+    results.append(summary)
+    return results
+
+
+def _load_record(action, samples, sessions):
+    record = timing_record(SUITE, action, samples, sessions)
+    ordered = sorted(samples)
+    record["p99_ms"] = ordered[min(len(ordered) - 1, round(0.99 * (len(ordered) - 1)))]
+    return record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadtest", description="Multi-session load test")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=30, help="seconds of generate/answer/submit loops")
+    parser.add_argument("--think-time", type=float, default=0.5, help="mean pause between actions, seconds")
+    parser.add_argument("--url", help="target an already running server instead of starting one")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="loadtest_results.json")
+    args = parser.parse_args(argv)
+
+    try:
+        import websockets  # noqa: F401
+    except ImportError:
+        parser.error("the load test needs the 'websockets' package (pip install websockets)")
+
+    results = run(args.sessions, args.duration, args.think_time, args.url, args.seed)
+    print_table([r for r in results if "p50_ms" in r])
+    summary = results[-1]
+    print()
+    for key, value in summary.items():
+        if key not in ("suite", "name", "size"):
+            print(f"{key:<22} {value:.3f}" if isinstance(value, float) else f"{key:<22} {value}")
+    write_results(args.output, results)
+    print(f"\nWrote {len(results)} results to {args.output}")
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
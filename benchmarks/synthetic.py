@@ -0,0 +1,56 @@
+import itertools
+import json
+import os
+import random
+
+from knowledge_base import URGENCY_TIERS, KnowledgeBase
+
+# ===== SYNTHETIC KNOWLEDGE BASES =====
+# Shaped like the real one: a dozen categories, 2-4 weighted symptoms, a key
+# finding, an age range and 0-2 risk factors per diagnosis, drawn from a word
+# list with a long-tailed (Zipf-like) frequency so that some findings are
+# shared widely and most are rare.
+
+CATEGORIES = [
+    "Retina", "Glaucoma", "Cornea", "Cataract", "Uveitis", "Neuro-Ophthalmology",
+    "Oculoplastics", "Pediatrics", "Strabismus", "Oncology", "Refractive", "Trauma",
+]
+
+
+def synthetic_diagnoses(n, seed=0, vocabulary_size=None):
+    rng = random.Random(seed)
+    vocabulary_size = vocabulary_size or max(200, n // 2)
+    vocabulary = [f"finding{i}" for i in range(vocabulary_size)]
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(vocabulary_size)))
+
+    def phrase(words):
+        return " ".join(rng.choices(vocabulary, cum_weights=cum_weights, k=words))
+
+    diagnoses = {}
+    for i in range(n):
+        symptoms = [phrase(2) for _ in range(rng.randint(2, 4))]
+        min_age = rng.randint(0, 70)
+        diagnoses[f"Synthetic Diagnosis {i:06d}"] = {
+            "symptoms": symptoms,
+            "symptom_weights": [rng.randint(1, 3) for _ in symptoms],
+            "key_finding": f"{phrase(2)}, {phrase(2)}",
+            "urgency": f"{rng.choice(URGENCY_TIERS)} - synthetic",
+            "category": CATEGORIES[i % len(CATEGORIES)],
+            "teaching": [phrase(4) for _ in range(rng.randint(1, 3))],
+            "age": [min_age, min_age + 20],
+            "risk_factors": [phrase(2) for _ in range(rng.randint(0, 2))],
+        }
+    return diagnoses
+
+
+def synthetic_knowledge_base(n, seed=0):
+    return KnowledgeBase(synthetic_diagnoses(n, seed))
+
+
+def write_synthetic_knowledge_base(directory, n, seed=0):
+    # On-disk copy so the app itself can be pointed at it via TRAINER_KB_PATH
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "01_synthetic.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(synthetic_diagnoses(n, seed), f)
+    return directory
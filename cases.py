@@ -0,0 +1,521 @@
+import copy
+import itertools
+import math
+from collections import namedtuple
+
+import numpy as np
+
+from distractors import DistractorIndex, exclusion_rows, sample_excluding
+from knowledge_base import exam_findings, load_knowledge_base
+
+# ===== BATCH CASE GENERATOR =====
+# Cases are drawn from precomputed key arrays in one vectorized pass, so a
+# whole exam set costs about the same as a single question. Nothing here
+# touches Streamlit; the UI pops questions from a per-session CasePool.
+#
+# A question is kept as a small Question record of integer ids and rendered
+# to text on demand from the shared knowledge base, so idle sessions don't
+# each hold their own copy of the question, explanation and teaching strings.
+#
+# Diagnosis ids survive knowledge-base reloads: added diagnoses get new ids at
+# the end and removed ones are kept as inactive ids that are never drawn, so
+# a Question built before a reload still points at the right entries.
+#
+# A case combines weighted symptoms, exam findings, risk factors and an age
+# drawn from the diagnosis's range, and renders as stages (presentation,
+# history, examination) that the UI can reveal one at a time. A CasePool
+# remembers the stems its session has been shown (see SeenStems) and no stem
+# comes up twice while an unseen one is left: a repeat's clues are redrawn,
+# and a diagnosis that has shown all of its stems gives way to another.
+
+NUM_OPTIONS = 4
+MIN_SYMPTOMS = 2
+MAX_SYMPTOMS = 3
+MAX_FINDINGS = 2
+MAX_HISTORY = 2
+# (fewest, most) symptoms, findings and risk factors a case shows
+CLUE_RANGES = ((MIN_SYMPTOMS, MAX_SYMPTOMS), (1, MAX_FINDINGS), (0, MAX_HISTORY))
+POOL_SIZE = 64
+# Random redraws of a repeated stem before one of its diagnosis's unseen
+# stems is picked directly
+DEDUP_ATTEMPTS = 8
+PROMPT = "The most likely diagnosis is:"
+
+# answer: diagnosis id, symptoms: symptom indexes into that diagnosis,
+# options: diagnosis ids in display order, seed: seed of the generating batch,
+# version: knowledge-base version it was generated from, findings and
+# history: exam finding and risk factor indexes, age: years, -1 = unstated
+Question = namedtuple(
+    "Question", ["answer", "symptoms", "options", "seed", "version", "findings", "history", "age"],
+    defaults=[(), (), -1],
+)
+
+
+def _subset_count(n, low, high):
+    # Subsets of n clues with between low and high members, as _draw picks them
+    return sum(math.comb(n, k) for k in range(min(low, n), min(high, n) + 1))
+
+
+def _subsets(n, low, high):
+    # The subsets _subset_count counts in rank order (see CaseGenerator.stems):
+    # by size, then colex
+    return [
+        subset for k in range(min(low, n), min(high, n) + 1)
+        for subset in sorted(itertools.combinations(range(n), k), key=lambda subset: subset[::-1])
+    ]
+
+
+def _clue_weights(info):
+    # (symptom, finding and risk factor weights, (min age, max age)) of one diagnosis
+    return (
+        info.get("symptom_weights") or [1.0] * len(info["symptoms"]),
+        [1.0] * len(exam_findings(info)),
+        [1.0] * len(info.get("risk_factors", ())),
+        tuple(info.get("age", (-1, -1))),
+    )
+
+
+def _with_rows(matrix, size, rows):
+    # Copy of a zero-padded weight matrix grown to `size` rows, with
+    # rows ({id: weights}) replaced; widened if a new row is longer
+    width = max([matrix.shape[1], *map(len, rows.values())])
+    out = np.zeros((size, width))
+    out[:len(matrix), :matrix.shape[1]] = matrix
+    for i, weights in rows.items():
+        out[i] = 0
+        out[i, :len(weights)] = weights
+    return out
+
+
+def _draw(rng, weights, low, high):
+    # Weighted sampling without replacement for every row at once: the
+    # smallest exponential keys scaled by 1/weight win. Each row takes between
+    # low and high picks, capped by its non-zero weights; -1 pads.
+    n, width = weights.shape
+    available = (weights > 0).sum(axis=1)
+    least = np.minimum(low, available)
+    counts = least + np.floor(rng.random(n) * (np.minimum(high, available) - least + 1)).astype(np.int64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        keys = rng.exponential(size=(n, width)) / weights
+    picks = np.full((n, high), -1, dtype=np.int64)
+    picks[:, :min(width, high)] = np.argsort(keys, axis=1)[:, :high]
+    picks[np.arange(high) >= counts[:, None]] = -1
+    return picks
+
+
+def explanation(dx_info):
+    return f"**Key finding:** {dx_info['key_finding']}. **Urgency:** {dx_info['urgency']}"
+
+
+def _article(words):
+    return "An" if words.startswith(("8", "11-", "18-", "infant")) else "A"
+
+
+def _patient(age, sex):
+    # "A 72-year-old woman", "An 8-year-old child", "An infant", "A patient"
+    adult = {"female": "woman", "male": "man"}.get(sex, "patient")
+    child = {"female": "girl", "male": "boy"}.get(sex, "child")
+    if age == 0:
+        words = "infant"
+    elif age > 0:
+        words = f"{age}-year-old {child if age < 18 else adult}"
+    else:
+        words = adult
+    return f"{_article(words)} {words}"
+
+
+def _join(items):
+    return items[0] if len(items) == 1 else f"{', '.join(items[:-1])} and {items[-1]}"
+
+
+class CaseBatch:
+    def __init__(self, answers, options, symptoms, findings, history, ages, seed, version=0):
+        self.answers = answers    # (n,) diagnosis index of the correct answer
+        self.options = options    # (n, k) diagnosis indexes in display order
+        self.symptoms = symptoms  # (n, MAX_SYMPTOMS) symptom indexes, -1 = unused
+        self.findings = findings  # (n, MAX_FINDINGS) exam finding indexes, -1 = unused
+        self.history = history    # (n, MAX_HISTORY) risk factor indexes, -1 = unused
+        self.ages = ages          # (n,) years, -1 = unstated
+        self.seed = seed
+        self.version = version
+
+    def __len__(self):
+        return len(self.answers)
+
+
+class SeenStems:
+    # Stems a session has been shown, as one int bitmask per diagnosis with a
+    # bit per stem rank (see CaseGenerator.stem): however long the session
+    # runs, at most one bit per stem of each diagnosis it has shown.
+    def __init__(self, masks=None):
+        self.masks = dict(masks or {})
+
+    def __contains__(self, stem):
+        answer, rank = stem
+        return bool(self.masks.get(answer, 0) >> rank & 1)
+
+    def __len__(self):
+        return sum(mask.bit_count() for mask in self.masks.values())
+
+    def add(self, stem):
+        answer, rank = stem
+        self.masks[answer] = self.masks.get(answer, 0) | 1 << rank
+
+    def count(self, answer):
+        return self.masks.get(answer, 0).bit_count()
+
+    def copy(self):
+        return SeenStems(self.masks)
+
+    def forget(self, answers):
+        # Edited diagnoses: their clue lists, and so their ranks, have changed
+        for answer in answers:
+            self.masks.pop(answer, None)
+
+
+class CaseGenerator:
+    def __init__(self, kb, distractors=None):
+        self.kb = kb
+        self.distractors = distractors
+        self.names = list(kb.diagnoses)
+        # Zero-padded (diagnoses, clues) weight matrices; zero = never drawn
+        clues = [_clue_weights(kb[dx]) for dx in self.names]
+        self.symptom_weights = _with_rows(np.zeros((0, 0)), len(clues), {i: c[0] for i, c in enumerate(clues)})
+        self.finding_weights = _with_rows(np.zeros((0, 0)), len(clues), {i: c[1] for i, c in enumerate(clues)})
+        self.history_weights = _with_rows(np.zeros((0, 0)), len(clues), {i: c[2] for i, c in enumerate(clues)})
+        self.age_ranges = np.array([c[3] for c in clues], dtype=np.int64).reshape(-1, 2)
+        self._count_stems()
+        self.ids = {dx: i for i, dx in enumerate(self.names)}
+        self.category_of = [kb[dx]["category"] for dx in self.names]
+        self.category_ids = {
+            cat: np.array([self.ids[dx] for dx in dx_list], dtype=np.int64)
+            for cat, dx_list in kb.by_category.items()
+        }
+        # revisions[i]: knowledge-base version that last edited or removed id i
+        self.revisions = np.zeros(len(self.names), dtype=np.int64)
+        self._set_active(np.ones(len(self.names), dtype=bool))
+
+    def _set_active(self, active):
+        self.active = active
+        self.active_ids = np.flatnonzero(active)
+        self.inactive_ids = np.flatnonzero(~active)
+        self.num_options = min(NUM_OPTIONS, len(self.active_ids))
+
+    def _count_stems(self):
+        # clue_counts[i]: symptoms, findings and risk factors of diagnosis i
+        # (its weights are the non-zero prefix of each row); subset_counts[i]:
+        # the clue subsets a case can show of each; stem_counts[i]: distinct stems
+        weights = (self.symptom_weights, self.finding_weights, self.history_weights)
+        self.clue_counts = np.stack([(w > 0).sum(axis=1) for w in weights], axis=1).reshape(-1, 3)
+        widest = int(self.clue_counts.max(initial=0))
+        self.subset_counts = np.stack([
+            np.array([_subset_count(n, low, high) for n in range(widest + 1)])[self.clue_counts[:, j]]
+            for j, (low, high) in enumerate(CLUE_RANGES)
+        ], axis=1).reshape(-1, 3)
+        self.stem_counts = self.subset_counts.prod(axis=1)
+        # Lookup tables for stems(): comb[c, k] = C(c, k), and per clue kind
+        # offsets[n, size] = subsets of n clues smaller than `size` a case shows
+        self._comb = np.array([[math.comb(c, k) for k in range(max(high for _, high in CLUE_RANGES) + 1)]
+                               for c in range(widest + 1)])
+        self._offsets = [
+            np.array([[_subset_count(n, low, size - 1) if size > min(low, n) else 0 for size in range(high + 1)]
+                      for n in range(widest + 1)])
+            for low, high in CLUE_RANGES
+        ]
+
+    def updated(self, kb, names, changed, removed, distractors=None):
+        # Copy of the generator for a reloaded knowledge base; `names` is the
+        # old id order plus any added diagnoses at the end
+        generator = copy.copy(self)
+        generator.kb = kb
+        generator.distractors = distractors
+        generator.names = names
+        added = len(names) - len(self.names)
+        generator.ids = dict(self.ids)
+        generator.ids.update((dx, i) for i, dx in enumerate(names[len(self.names):], len(self.names)))
+        generator.category_of = self.category_of + [None] * added
+        generator.revisions = np.concatenate([self.revisions, np.zeros(added, dtype=np.int64)])
+        generator.age_ranges = np.concatenate([self.age_ranges, np.full((added, 2), -1, dtype=np.int64)])
+        active = np.concatenate([self.active, np.ones(added, dtype=bool)])
+
+        touched_categories = set()
+        clues = {}
+        for dx in [*changed, *removed]:
+            i = generator.ids[dx]
+            touched_categories.add(generator.category_of[i])
+            if dx in kb:
+                generator.category_of[i] = kb[dx]["category"]
+                clues[i] = _clue_weights(kb[dx])
+                active[i] = True
+            else:
+                generator.category_of[i] = None
+                clues[i] = ([], [], [], (-1, -1))
+                active[i] = False
+            generator.age_ranges[i] = clues[i][3]
+            touched_categories.add(generator.category_of[i])
+            generator.revisions[i] = kb.version
+        size = len(names)
+        generator.symptom_weights = _with_rows(self.symptom_weights, size, {i: c[0] for i, c in clues.items()})
+        generator.finding_weights = _with_rows(self.finding_weights, size, {i: c[1] for i, c in clues.items()})
+        generator.history_weights = _with_rows(self.history_weights, size, {i: c[2] for i, c in clues.items()})
+        generator._count_stems()
+        generator.category_ids = dict(self.category_ids)
+        for cat in touched_categories - {None}:
+            if cat in kb.by_category:
+                generator.category_ids[cat] = np.array([generator.ids[dx] for dx in kb.by_category[cat]], dtype=np.int64)
+            else:
+                generator.category_ids.pop(cat, None)
+        generator._set_active(active)
+        return generator
+
+    def is_current(self, question):
+        # False once a diagnosis the question shows was edited or removed
+        # after it was generated
+        return int(self.revisions[list(question.options)].max()) <= question.version
+
+    def _draw_ages(self, rng, answers):
+        low, high = self.age_ranges[answers].T
+        return np.where(low >= 0, low + np.floor(rng.random(len(answers)) * (high - low + 1)).astype(np.int64), -1)
+
+    def _draw_clues(self, rng, answers):
+        # (symptoms, findings, history, ages) for each answer
+        return [
+            *(_draw(rng, weights[answers], low, high) for weights, (low, high) in zip(
+                (self.symptom_weights, self.finding_weights, self.history_weights), CLUE_RANGES
+            )),
+            self._draw_ages(rng, answers),
+        ]
+
+    def stems(self, answers, clues):
+        # Rank of each row's stem among its diagnosis's stem_counts: the same
+        # diagnosis with the same clues in any order is the same stem, and a
+        # different age alone doesn't make a new case. Each kind of clue is
+        # ranked by size and then colex (sum of C(clue, position + 1) over
+        # the sorted clues), and the three ranks are mixed radix.
+        ranks = np.zeros(len(answers), dtype=np.int64)
+        for kind, (column, offsets) in enumerate(zip(clues, self._offsets)):
+            picks = np.sort(column, axis=1)  # -1 padding first
+            sizes = (picks >= 0).sum(axis=1)
+            positions = np.arange(picks.shape[1]) - (picks.shape[1] - sizes)[:, None]
+            colex = np.where(picks >= 0, self._comb[np.maximum(picks, 0), np.maximum(positions + 1, 0)], 0)
+            kind_ranks = offsets[self.clue_counts[answers, kind], sizes] + colex.sum(axis=1)
+            ranks = ranks * self.subset_counts[answers, kind] + kind_ranks
+        return ranks
+
+    def stem(self, question):
+        # (answer, rank) naming the question's stem, as SeenStems holds them
+        clues = [
+            np.array([list(items) + [-1] * (width - len(items))], dtype=np.int64)
+            for items, width in zip((question.symptoms, question.findings, question.history),
+                                    (MAX_SYMPTOMS, MAX_FINDINGS, MAX_HISTORY))
+        ]
+        return question.answer, int(self.stems(np.array([question.answer]), clues)[0])
+
+    def _unseen_stems(self, answer, used):
+        # [(rank, (symptoms, findings, history))] of the stems not in `used`
+        choices = [_subsets(n, low, high) for n, (low, high) in zip(self.clue_counts[answer].tolist(), CLUE_RANGES)]
+        return [
+            (rank, clues) for rank, clues in enumerate(itertools.product(*choices)) if (answer, rank) not in used
+        ]
+
+    def _fresh(self, pool, used):
+        # The diagnoses of `pool` with a stem `used` doesn't hold yet
+        spent = [answer for answer in used.masks if used.count(answer) >= self.stem_counts[answer]]
+        return np.setdiff1d(pool, spent) if spent else pool
+
+    def _repeats(self, answers, clues, rows, used):
+        # Those of `rows` whose stem `used` already holds; the others' are added
+        rows = list(rows)
+        ranks = self.stems(answers[rows], [column[rows] for column in clues[:3]]).tolist()
+        repeats = []
+        for i, stem in zip(rows, zip(answers[rows].tolist(), ranks)):
+            if stem in used:
+                repeats.append(i)
+            else:
+                used.add(stem)
+        return repeats
+
+    def _dedup(self, rng, answers, clues, seen, pool):
+        # Rewrites, in place, the rows whose stem is in `seen` or repeats an
+        # earlier row. A few random redraws first; then each row left gets one
+        # of its diagnosis's unseen stems, picked directly. Answers drawn here
+        # (`pool` is not None) move off diagnoses with no stems left, so a
+        # repeat only gets through once all of `pool` has been shown, or for
+        # a caller-picked answer whose stems have all been shown.
+        used = seen.copy()
+        rows = self._repeats(answers, clues, range(len(answers)), used)
+        for _ in range(DEDUP_ATTEMPTS):
+            if not rows:
+                return
+            if pool is not None:
+                fresh = self._fresh(pool, used)
+                if not len(fresh):
+                    return
+                answers[rows] = fresh[rng.integers(0, len(fresh), size=len(rows))]
+            for column, redrawn in zip(clues, self._draw_clues(rng, answers[rows])):
+                column[rows] = redrawn
+            rows = self._repeats(answers, clues, rows, used)
+        for i in rows:
+            if pool is not None and used.count(int(answers[i])) >= self.stem_counts[answers[i]]:
+                fresh = self._fresh(pool, used)
+                if not len(fresh):
+                    return
+                answers[i] = fresh[rng.integers(len(fresh))]
+                clues[3][i] = self._draw_ages(rng, answers[i:i + 1])[0]
+            unseen = self._unseen_stems(int(answers[i]), used)
+            if not unseen:
+                continue
+            rank, picked = unseen[rng.integers(len(unseen))]
+            for column, subset in zip(clues, picked):
+                column[i] = -1
+                column[i, :len(subset)] = rng.permutation(np.array(subset, dtype=np.int64))
+            used.add((int(answers[i]), rank))
+
+    def generate(self, n, seed=None, category=None, difficulty=None, answers=None, seen=None):
+        # seen: SeenStems of stems to avoid; repeats within the batch are
+        # avoided too
+        if seed is None:
+            seed = int(np.random.SeedSequence().generate_state(1)[0])
+        rng = np.random.default_rng(seed)
+        total = len(self.names)
+
+        pool = None
+        if answers is not None:
+            # Caller (e.g. the spaced-repetition scheduler) picked the answers
+            answers = np.asarray(answers, dtype=np.int64)
+            n = len(answers)
+        else:
+            pool = self.active_ids if category is None else self.category_ids.get(category)
+            if pool is None:
+                raise KeyError(f"Unknown category: {category}")
+            answers = pool[rng.integers(0, len(pool), size=n)]
+
+        clues = self._draw_clues(rng, answers)
+        if seen is not None:
+            self._dedup(rng, answers, clues, seen, pool)
+        symptoms, findings, history, ages = clues
+
+        # Distractors: nearest-neighbour bands when a similarity index is
+        # available, otherwise uniform over every diagnosis except the answer
+        k = self.num_options - 1
+        if self.distractors is not None and difficulty is not None:
+            distractors = self.distractors.sample(answers, k, rng, difficulty)
+        else:
+            distractors = sample_excluding(rng, total, exclusion_rows(answers, self.inactive_ids), k)
+        options = rng.permuted(np.concatenate([answers[:, None], distractors], axis=1), axis=1)
+
+        # Narrow dtypes: a pooled batch sits in session state between clicks
+        return CaseBatch(
+            answers.astype(np.int32), options.astype(np.int32), symptoms.astype(np.int8),
+            findings.astype(np.int8), history.astype(np.int8), ages.astype(np.int16), seed, self.kb.version,
+        )
+
+    def question(self, batch, i):
+        return Question(
+            int(batch.answers[i]),
+            tuple(s for s in batch.symptoms[i].tolist() if s >= 0),
+            tuple(batch.options[i].tolist()),
+            batch.seed,
+            batch.version,
+            tuple(f for f in batch.findings[i].tolist() if f >= 0),
+            tuple(h for h in batch.history[i].tolist() if h >= 0),
+            int(batch.ages[i]),
+        )
+
+    def render(self, question):
+        correct_dx = self.names[question.answer]
+        dx_info = self.kb[correct_dx]
+        patient = _patient(question.age, dx_info.get("sex"))
+        symptoms = [f"**{dx_info['symptoms'][s]}**" for s in question.symptoms]
+        stages = [f"{patient} presents with {_join(symptoms)}." if symptoms else f"{patient} presents for review."]
+        if question.history:
+            risk_factors = dx_info["risk_factors"]
+            stages.append(f"**History:** {', '.join(risk_factors[h] for h in question.history)}.")
+        if question.findings:
+            findings = exam_findings(dx_info)
+            stages.append(f"**Examination:** {', '.join(findings[f] for f in question.findings)}.")
+        return {
+            "question": f"{' '.join(stages)} {PROMPT}",
+            "stages": stages,
+            "options": [self.names[o] for o in question.options],
+            "correct_answer": correct_dx,
+            "explanation": explanation(dx_info),
+            "teaching_points": dx_info["teaching"],
+            "category": dx_info["category"]
+        }
+
+    def questions(self, batch):
+        for i in range(len(batch)):
+            yield self.render(self.question(batch, i))
+
+
+class CasePool:
+    # Per-session queue of pregenerated cases, refilled a batch at a time
+    def __init__(self, generator, size=POOL_SIZE, category=None, difficulty=None):
+        self.generator = generator
+        self.size = size
+        self.category = category
+        self.difficulty = difficulty
+        self.batch = None
+        self.cursor = 0
+        # Stems this session has been shown; ids are stable across reloads,
+        # so only edited diagnoses are forgotten on a rebind
+        self.seen = SeenStems()
+
+    def configure(self, category=None, difficulty=None):
+        # Settings changes drop the pregenerated cases built with the old ones
+        if (category, difficulty) != (self.category, self.difficulty):
+            self.category = category
+            self.difficulty = difficulty
+            self.batch = None
+
+    def rebind(self, generator):
+        # After a knowledge-base reload the pregenerated cases may show
+        # edited or removed diagnoses, so start over with the new generator
+        if generator is not self.generator:
+            self.seen.forget(np.flatnonzero(generator.revisions > self.generator.kb.version).tolist())
+            self.generator = generator
+            self.batch = None
+
+    def __len__(self):
+        return 0 if self.batch is None else len(self.batch) - self.cursor
+
+    def next(self):
+        if not len(self):
+            self.batch = self.generator.generate(
+                self.size, category=self.category, difficulty=self.difficulty, seen=self.seen
+            )
+            self.cursor = 0
+        question = self.generator.question(self.batch, self.cursor)
+        self.cursor += 1
+        stem = self.generator.stem(question)
+        if stem in self.seen:
+            # Shown by another path (e.g. the scheduler) since the batch was
+            # drawn; draw a replacement with the pool's own settings
+            return self.generate(1, category=self.category, difficulty=self.difficulty)[0]
+        self.seen.add(stem)
+        return question
+
+    def generate(self, n, answers=None, difficulty=None, category=None):
+        # Questions outside the pooled batch (scheduler picks, exams), also
+        # kept clear of the stems this session has seen
+        batch = self.generator.generate(n, category=category, difficulty=difficulty, answers=answers, seen=self.seen)
+        questions = [self.generator.question(batch, i) for i in range(len(batch))]
+        for question in questions:
+            self.seen.add(self.generator.stem(question))
+        return questions
+
+
+_default_generator = None
+
+
+def generate_cases(n, seed=None, category=None, kb=None, difficulty=None):
+    global _default_generator
+    if kb is not None:
+        generator = CaseGenerator(kb, DistractorIndex(kb) if difficulty else None)
+    else:
+        if _default_generator is None:
+            default_kb = load_knowledge_base()
+            _default_generator = CaseGenerator(default_kb, DistractorIndex(default_kb))
+        generator = _default_generator
+    return list(generator.questions(generator.generate(n, seed, category, difficulty)))
@@ -0,0 +1,213 @@
+import copy
+import re
+
+import numpy as np
+
+# ===== SIMILARITY-AWARE DISTRACTORS =====
+# Each diagnosis is encoded as a sparse set of feature ids (words from its
+# symptoms and key finding, plus its category). Pairwise Jaccard similarity is
+# computed once at startup, block by block so memory stays O(block * N), and
+# only the ranked nearest neighbours are kept. Serving a question then picks
+# from a precomputed band of that ranking:
+#   near - the most similar diagnoses (hardest)
+#   mid  - the next band down
+#   far  - anything outside both bands (easiest)
+#
+# After a knowledge-base reload, updated() re-ranks only the edited rows and
+# the rows whose neighbour lists they can enter or leave. Ids are stable:
+# new diagnoses are appended and removed ones stay as inactive rows that are
+# never drawn.
+
+DIFFICULTIES = ["near", "mid", "far"]
+BAND_SIZE = 8
+BLOCK_SIZE = 256
+
+STOPWORDS = {
+    "a", "an", "and", "as", "at", "by", "for", "from", "if", "in", "no",
+    "of", "on", "or", "the", "to", "upon", "with", "often",
+}
+
+_word_re = re.compile(r"[a-z0-9]+")
+
+
+def diagnosis_features(info):
+    text = " ".join(info["symptoms"] + [info["key_finding"]]).lower()
+    features = {word for word in _word_re.findall(text) if word not in STOPWORDS}
+    features.add("category:" + info["category"])
+    return features
+
+
+def sample_excluding(rng, total, excluded, k):
+    # Draw k distinct values per row from range(total) minus that row's
+    # `excluded` values (which must themselves be distinct). Each draw is a
+    # rank among the values still available, shifted past the taken ones
+    # in ascending order.
+    n, m = excluded.shape
+    chosen = np.empty((n, k), dtype=np.int64)
+    for j in range(k):
+        draw = rng.integers(0, total - m - j, size=n)
+        taken = np.sort(np.concatenate([excluded, chosen[:, :j]], axis=1), axis=1)
+        for t in range(taken.shape[1]):
+            draw += draw >= taken[:, t]
+        chosen[:, j] = draw
+    return chosen
+
+
+def exclusion_rows(answers, inactive):
+    # Per-answer exclusion rows for sample_excluding: the answer itself plus
+    # every inactive (removed) diagnosis id
+    excluded = answers[:, None]
+    if len(inactive):
+        excluded = np.concatenate([excluded, np.broadcast_to(inactive, (len(answers), len(inactive)))], axis=1)
+    return excluded
+
+
+def _jitter(total):
+    # Tiny fixed jitter breaks ties without favouring low indexes; the same
+    # id always gets the same value, however many rows there are
+    return np.random.default_rng(0).random(total) * 1e-6
+
+
+class DistractorIndex:
+    def __init__(self, kb, band=BAND_SIZE, block_size=BLOCK_SIZE):
+        self.names = list(kb.diagnoses)
+        self.block_size = block_size
+        total = len(self.names)
+        self.band = max(1, min(band, (total - 1) // 2))
+        self.width = min(2 * self.band, total - 1)
+        self.active = np.ones(total, dtype=bool)
+        self._jitter = _jitter(total)
+
+        self._vocab = {}
+        self._rows = [self._encode(kb[dx]) for dx in self.names]
+        self._build_postings()
+
+        self.neighbors = np.empty((total, self.width), dtype=np.int64)
+        self.neighbor_sim = np.empty((total, self.width), dtype=np.float32)
+        self._rank_rows(np.arange(total))
+        self._build_far_excluded()
+
+    def _encode(self, info):
+        return sorted(self._vocab.setdefault(f, len(self._vocab)) for f in diagnosis_features(info))
+
+    def _build_postings(self):
+        # CSR-style feature lists and the matching inverted postings
+        total = len(self._rows)
+        self.num_features = len(self._vocab)
+        self.feature_counts = np.array([len(r) for r in self._rows], dtype=np.int64)
+        row_ids = np.repeat(np.arange(total), self.feature_counts)
+        feature_ids = np.fromiter((f for r in self._rows for f in r), dtype=np.int64, count=len(row_ids))
+        order = np.argsort(feature_ids, kind="stable")
+        self._postings = row_ids[order]
+        self._posting_starts = np.searchsorted(feature_ids[order], np.arange(self.num_features + 1))
+        self._row_starts = np.concatenate([[0], np.cumsum(self.feature_counts)])
+        self._row_features = feature_ids
+
+    def _build_far_excluded(self):
+        # Sorted per-row exclusion set for "far" draws: self + near + mid
+        # bands + inactive ids
+        total = len(self.names)
+        inactive = np.flatnonzero(~self.active)
+        columns = [np.arange(total)[:, None], self.neighbors]
+        if len(inactive):
+            columns.append(np.broadcast_to(inactive, (total, len(inactive))))
+        self._far_excluded = np.sort(np.concatenate(columns, axis=1), axis=1)
+
+    def _similarity_rows(self, rows):
+        # Jaccard similarity of each row in `rows` against every diagnosis
+        total = len(self.names)
+        block_rows = []
+        block_cols = []
+        for local, i in enumerate(rows):
+            features = self._row_features[self._row_starts[i]:self._row_starts[i + 1]]
+            lists = [self._postings[self._posting_starts[f]:self._posting_starts[f + 1]] for f in features]
+            cols = np.concatenate(lists) if lists else np.empty(0, dtype=np.int64)
+            block_rows.append(np.full(len(cols), local, dtype=np.int64))
+            block_cols.append(cols)
+        keys = np.concatenate(block_rows) * total + np.concatenate(block_cols)
+        shared = np.bincount(keys, minlength=len(rows) * total).reshape(len(rows), total)
+        counts = self.feature_counts
+        union = counts[rows, None] + counts[None, :] - shared
+        return shared / np.maximum(union, 1)
+
+    def _rank_rows(self, rows):
+        # Recompute the ranked neighbour lists of `rows`, block by block
+        width = self.width
+        inactive = np.flatnonzero(~self.active)
+        for start in range(0, len(rows), self.block_size):
+            block = rows[start:start + self.block_size]
+            sim = self._similarity_rows(block) + self._jitter
+            sim[np.arange(len(block)), block] = -1.0
+            sim[:, inactive] = -1.0
+            top = np.argpartition(-sim, width - 1, axis=1)[:, :width]
+            top_sim = np.take_along_axis(sim, top, axis=1)
+            order = np.argsort(-top_sim, axis=1)
+            self.neighbors[block] = np.take_along_axis(top, order, axis=1)
+            self.neighbor_sim[block] = np.take_along_axis(top_sim, order, axis=1)
+
+    def updated(self, kb, names, changed, removed):
+        # Copy of the index for a reloaded knowledge base. `names` is the new
+        # id order: the old names plus any added diagnoses at the end.
+        index = copy.copy(self)
+        index.names = names
+        total = len(names)
+        added = total - len(self.names)
+        ids = {dx: i for i, dx in enumerate(names)}
+        index._vocab = dict(self._vocab)
+        index._rows = self._rows + [[] for _ in range(added)]
+        index.active = np.concatenate([self.active, np.ones(added, dtype=bool)])
+        index._jitter = _jitter(total)
+        for dx in changed:
+            index._rows[ids[dx]] = index._encode(kb[dx])
+            index.active[ids[dx]] = True
+        for dx in removed:
+            index._rows[ids[dx]] = []
+            index.active[ids[dx]] = False
+        index._build_postings()
+
+        touched = np.array(sorted({ids[dx] for dx in [*changed, *removed]}), dtype=np.int64)
+        # Rows that had a touched diagnosis as a neighbour may lose it; rows
+        # whose weakest neighbour a touched diagnosis now beats may gain it
+        old = len(self.names)
+        stale = np.isin(self.neighbors, touched).any(axis=1)
+        sim = index._similarity_rows(touched)[:, :old] + index._jitter[touched, None]
+        sim[~index.active[touched]] = -1.0
+        stale |= (sim >= self.neighbor_sim[:, -1]).any(axis=0)
+        rerank = np.union1d(np.flatnonzero(stale), np.concatenate([touched, np.arange(old, total)]))
+
+        index.neighbors = np.concatenate([self.neighbors, np.empty((added, self.width), dtype=np.int64)])
+        index.neighbor_sim = np.concatenate([self.neighbor_sim, np.empty((added, self.width), dtype=np.float32)])
+        index._rank_rows(rerank)
+        index._build_far_excluded()
+        index.reranked = len(rerank)
+        return index
+
+    def similarity(self, i, j):
+        a = self._row_features[self._row_starts[i]:self._row_starts[i + 1]]
+        b = self._row_features[self._row_starts[j]:self._row_starts[j + 1]]
+        shared = len(np.intersect1d(a, b, assume_unique=True))
+        return shared / max(len(a) + len(b) - shared, 1)
+
+    def sample(self, answers, k, rng, difficulty="near"):
+        # Vectorized over a batch of answer ids; returns an (n, k) id array
+        answers = np.asarray(answers, dtype=np.int64)
+        total = len(self.names)
+        k = min(k, int(self.active.sum()) - 1)
+        if difficulty == "far" and total - self._far_excluded.shape[1] < k:
+            difficulty = "mid"
+        if difficulty == "mid" and self.neighbors.shape[1] - self.band < k:
+            difficulty = "near"
+
+        if difficulty == "far":
+            return sample_excluding(rng, total, self._far_excluded[answers], k)
+        if difficulty not in ("near", "mid"):
+            raise ValueError(f"Unknown difficulty: {difficulty}")
+
+        offset = 0 if difficulty == "near" else self.band
+        width = min(self.band, self.neighbors.shape[1] - offset)
+        if width < k:
+            # Band too narrow for this knowledge base; fall back to uniform
+            return sample_excluding(rng, total, exclusion_rows(answers, np.flatnonzero(~self.active)), k)
+        empty = np.empty((len(answers), 0), dtype=np.int64)
+        positions = offset + sample_excluding(rng, width, empty, k)
+        return np.take_along_axis(self.neighbors[answers], positions, axis=1)
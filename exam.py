@@ -0,0 +1,81 @@
+import time
+
+# ===== TIMED EXAM =====
+# A fixed set of questions generated up front in one batch, answered in order
+# against a single deadline, with no feedback until the end. Each answered
+# question keeps its timings, so the results can tell a slow trainee
+# (response time) apart from a slow server (generate / render / grade).
+#
+# The deadline is enforced here, on the server: an answer submitted after
+# it is not counted, whatever the browser's countdown showed.
+
+EXAM_LENGTHS = [10, 20, 50]
+SECONDS_PER_QUESTION = 90
+
+
+class Exam:
+    def __init__(self, questions, time_limit, generate_seconds=0.0, started_at=None):
+        self.questions = list(questions)
+        self.started_at = time.time() if started_at is None else started_at
+        self.deadline = self.started_at + time_limit
+        # The batch is generated in one pass; each question gets an equal share
+        self.generate_seconds = generate_seconds / max(len(self.questions), 1)
+        self.answers = []  # chosen diagnosis id per answered question
+        self.timings = []  # (response, generate, render, grade) seconds per answered question
+        self.shown_at = None
+        self.render_seconds = 0.0
+        self.closed = False
+
+    def __len__(self):
+        return len(self.questions)
+
+    def remaining(self, now=None):
+        now = time.time() if now is None else now
+        return max(0.0, self.deadline - now)
+
+    def finished(self, now=None):
+        return len(self.answers) == len(self.questions) or self.remaining(now) <= 0
+
+    @property
+    def current(self):
+        # The question being answered, or None once every question is answered
+        if len(self.answers) < len(self.questions):
+            return self.questions[len(self.answers)]
+        return None
+
+    def replace_current(self, question):
+        # After a knowledge-base reload edited the unanswered current question
+        self.questions[len(self.answers)] = question
+
+    def shown(self, render_seconds, now=None):
+        # Called the first time the current question is rendered
+        if self.shown_at is None:
+            self.shown_at = time.time() if now is None else now
+            self.render_seconds = render_seconds
+
+    def answer(self, chosen, grade_seconds, now=None):
+        # Returns the response time, or None if the deadline had passed
+        now = time.time() if now is None else now
+        if self.finished(now):
+            return None
+        response = now - (self.shown_at or now)
+        self.answers.append(chosen)
+        self.timings.append((response, self.generate_seconds, self.render_seconds, grade_seconds))
+        self.shown_at = None
+        self.render_seconds = 0.0
+        return response
+
+    def close(self):
+        # True the first time a finished exam is closed, for one-off bookkeeping
+        if self.closed:
+            return False
+        self.closed = True
+        return True
+
+    @property
+    def correct(self):
+        return sum(chosen == question.answer for chosen, question in zip(self.answers, self.questions))
+
+    @property
+    def expired(self):
+        return len(self.answers) < len(self.questions)
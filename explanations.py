@@ -0,0 +1,76 @@
+import os
+import threading
+from collections import OrderedDict
+
+import metrics
+from cases import explanation
+
+# ===== EXPLANATION CACHE =====
+# The markdown shown after an answer (explanation and teaching points)
+# depends only on the diagnosis, so it is rendered once per diagnosis and
+# knowledge-base version and shared by every session in the process: a whole
+# class submitting at once costs one render and one st.markdown each.
+# Entries from before a reload are never hit again and age out of the LRU.
+# TRAINER_EXPLANATION_CACHE_SIZE sets the number of entries.
+
+CACHE_SIZE = 1024
+
+
+class LRUCache:
+    def __init__(self, maxsize, counter=None):
+        self.maxsize = maxsize
+        self.counter = counter  # metrics.Counter labelled by event: hit, miss, eviction
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _count(self, event):
+        if self.counter is not None:
+            self.counter.inc(event)
+
+    def get(self, key, build):
+        # Cached value for key, calling build() on a miss
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                value = self._entries[key]
+                self._count("hit")
+                return value
+        self._count("miss")
+        # Built outside the lock; two sessions missing at once both build,
+        # and the second result simply replaces the first
+        value = build()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._count("eviction")
+        return value
+
+
+def cache_size():
+    return int(os.environ.get("TRAINER_EXPLANATION_CACHE_SIZE", CACHE_SIZE))
+
+
+CACHE = LRUCache(cache_size(), metrics.EXPLANATION_CACHE)
+
+
+def _render(dx_info):
+    teaching = "\n".join(f"{i}. {point}" for i, point in enumerate(dx_info["teaching"], 1))
+    return (
+        "---\n\n"
+        "#### 📖 Detailed Explanation\n\n"
+        f"{explanation(dx_info)}\n\n"
+        "#### 🎓 Key Learning Points\n\n"
+        f"{teaching}"
+    )
+
+
+def explanation_markdown(generator, dx_id):
+    # One markdown block for the diagnosis's explanation and teaching points
+    return CACHE.get(
+        (dx_id, generator.kb.version), lambda: _render(generator.kb[generator.names[dx_id]])
+    )
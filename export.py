@@ -0,0 +1,254 @@
+import argparse
+import html
+import json
+import os
+import re
+import sys
+import textwrap
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from cases import CaseGenerator, SeenStems
+from distractors import DIFFICULTIES, DistractorIndex
+from knowledge_base import load_knowledge_base
+
+# ===== BULK EXAM EXPORT =====
+# Builds printable / LMS-importable exams with the same generator as the
+# "Generate New Case" button:
+#
+#   python export.py --per-category 500 --seed 7 --format jsonl -o bank.jsonl
+#
+# Work is split into (category, count, seed) chunks. A process pool generates
+# and renders each chunk, and the parent writes chunks in order as they
+# finish. At most a few chunks are in flight at once, so memory stays bounded
+# however large the bank is. The same seed always gives the same exam.
+
+FORMATS = ["jsonl", "html", "pdf"]
+CHUNK_SIZE = 1000
+
+_bold_re = re.compile(r"\*\*(.+?)\*\*")
+
+_worker_generator = None
+
+
+def _init_worker(kb_path, difficulty):
+    global _worker_generator
+    kb = load_knowledge_base(kb_path)
+    _worker_generator = CaseGenerator(kb, DistractorIndex(kb) if difficulty else None)
+
+
+def plan_chunks(categories, per_category, seed, chunk_size=CHUNK_SIZE):
+    # [(category, first question number, count, chunk seed)], deterministic in seed
+    plan = []
+    for category in categories:
+        for start in range(0, per_category, chunk_size):
+            plan.append((category, start, min(chunk_size, per_category - start)))
+    seeds = np.random.SeedSequence(seed).generate_state(len(plan))
+    return [(category, start, count, int(chunk_seed)) for (category, start, count), chunk_seed in zip(plan, seeds)]
+
+
+def _questions(chunk, difficulty):
+    category, start, count, chunk_seed = chunk
+    # No stem repeats within a chunk while the category has unused ones
+    batch = _worker_generator.generate(count, seed=chunk_seed, category=category, difficulty=difficulty, seen=SeenStems())
+    for i, q in enumerate(_worker_generator.questions(batch)):
+        q["id"] = f"{category}-{start + i + 1}"
+        yield q
+
+
+def render_chunk(chunk, fmt, difficulty=None):
+    questions = _questions(chunk, difficulty)
+    if fmt == "jsonl":
+        return "".join(json.dumps(q, ensure_ascii=False) + "\n" for q in questions)
+    if fmt == "html":
+        return "".join(_html_question(q) for q in questions)
+    # pdf: wrapped plain-text lines; the parent lays them out on pages
+    return [_pdf_lines(q) for q in questions]
+
+
+def _html_question(q):
+    stem = _bold_re.sub(r"<strong>\1</strong>", html.escape(q["question"]))
+    options = "".join(f"<li>{html.escape(option)}</li>" for option in q["options"])
+    explanation = _bold_re.sub(r"<strong>\1</strong>", html.escape(q["explanation"]))
+    teaching = "".join(f"<li>{html.escape(point)}</li>" for point in q["teaching_points"])
+    return (
+        f'<section class="question" id="{html.escape(q["id"])}">\n'
+        f'<h3>{html.escape(q["id"])} <small>{html.escape(q["category"])}</small></h3>\n'
+        f"<p>{stem}</p>\n<ol type=\"A\">{options}</ol>\n"
+        f"<details><summary>Answer</summary><p><strong>{html.escape(q['correct_answer'])}</strong></p>"
+        f"<p>{explanation}</p><ol>{teaching}</ol></details>\n</section>\n"
+    )
+
+
+def _pdf_lines(q):
+    plain = _bold_re.sub(r"\1", q["question"])
+    lines = [f"{q['id']}  ({q['category']})"]
+    lines += textwrap.wrap(plain, 90)
+    lines += [f"   {letter}. {option}" for letter, option in zip("ABCDEFGH", q["options"])]
+    lines.append(f"   Answer: {q['correct_answer']}")
+    lines.append("")
+    return lines
+
+
+# ----- output writers -----
+
+class JsonlWriter:
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, chunk):
+        self.f.write(chunk)
+
+    def close(self):
+        pass
+
+
+class HtmlWriter(JsonlWriter):
+    def __init__(self, f, title):
+        super().__init__(f)
+        f.write(
+            "<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\">"
+            f"<title>{html.escape(title)}</title>"
+            "<style>body{font-family:sans-serif;max-width:50rem;margin:auto}"
+            ".question{page-break-inside:avoid;border-bottom:1px solid #ccc}"
+            "@media print{details{display:block}}</style></head><body>\n"
+            f"<h1>{html.escape(title)}</h1>\n"
+        )
+
+    def close(self):
+        self.f.write("</body></html>\n")
+
+
+class PdfWriter:
+    # Minimal streaming PDF: one Helvetica text page per LINES_PER_PAGE lines.
+    # Page objects are written as soon as they fill; only the byte offsets of
+    # written objects are kept for the xref table.
+    LINES_PER_PAGE = 60
+    LEADING = 12
+
+    def __init__(self, f, title):
+        self.f = f
+        self.position = 0
+        self.offsets = {}
+        self.page_ids = []
+        self.lines = [title, ""]
+        self.next_id = 4  # 1 catalog, 2 pages, 3 font
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    def _write(self, data):
+        self.f.write(data)
+        self.position += len(data)
+
+    def _object(self, obj_id, body):
+        self.offsets[obj_id] = self.position
+        self._write(b"%d 0 obj\n" % obj_id + body + b"\nendobj\n")
+
+    def write(self, chunk):
+        for question_lines in chunk:
+            if len(self.lines) + len(question_lines) > self.LINES_PER_PAGE:
+                self._flush_page()
+            self.lines.extend(question_lines)
+
+    def _flush_page(self):
+        if not self.lines:
+            return
+        text = ["BT", "/F1 10 Tf", f"{self.LEADING} TL", "50 800 Td"]
+        for line in self.lines:
+            escaped = line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+            text.append(f"({escaped}) '")
+        text.append("ET")
+        stream = "\n".join(text).encode("cp1252", "replace")
+        content_id, page_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        self._object(content_id, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        self._object(page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode())
+        self.page_ids.append(page_id)
+        self.lines = []
+
+    def close(self):
+        self._flush_page()
+        kids = " ".join(f"{page_id} 0 R" for page_id in self.page_ids)
+        self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.page_ids)} >>".encode())
+        self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref_at = self.position
+        size = self.next_id
+        entries = [b"0000000000 65535 f \n"]
+        for obj_id in range(1, size):
+            entries.append(b"%010d 00000 n \n" % self.offsets.get(obj_id, 0))
+        self._write(b"xref\n0 %d\n" % size + b"".join(entries))
+        self._write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref_at))
+
+
+def _ordered_imap(executor, fn, items, window):
+    # Like executor.map, but keeps at most `window` tasks in flight
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(fn, *item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def export(output, fmt, per_category, seed=0, categories=None, difficulty=None,
+           workers=None, chunk_size=CHUNK_SIZE, kb_path=None, title="Ophthalmology Board Review"):
+    kb = load_knowledge_base(kb_path)
+    categories = categories or list(kb.categories)
+    unknown = [category for category in categories if category not in kb.categories]
+    if unknown:
+        raise ValueError(f"Unknown categories: {', '.join(unknown)}")
+    plan = plan_chunks(categories, per_category, seed, chunk_size)
+    workers = workers or os.cpu_count() or 1
+
+    binary = fmt == "pdf"
+    with open(output, "wb" if binary else "w", encoding=None if binary else "utf-8") as f:
+        if fmt == "jsonl":
+            writer = JsonlWriter(f)
+        elif fmt == "html":
+            writer = HtmlWriter(f, title)
+        else:
+            writer = PdfWriter(f, title)
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(kb_path, difficulty)) as executor:
+            tasks = ((chunk, fmt, difficulty) for chunk in plan)
+            for rendered in _ordered_imap(executor, render_chunk, tasks, 2 * workers):
+                writer.write(rendered)
+        writer.close()
+    return sum(count for _, _, count, _ in plan)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export a generated exam to JSONL, HTML or PDF")
+    parser.add_argument("--per-category", type=int, required=True, help="questions per category")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--format", choices=FORMATS, default="jsonl")
+    parser.add_argument("-o", "--output", help="output file (default: exam.<format>)")
+    parser.add_argument("--categories", nargs="+", help="limit to these categories")
+    parser.add_argument("--difficulty", choices=DIFFICULTIES, help="similarity-based distractors")
+    parser.add_argument("--workers", type=int, help="process pool size (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--kb", help="knowledge base directory or file")
+    parser.add_argument("--title", default="Ophthalmology Board Review")
+    args = parser.parse_args(argv)
+
+    output = args.output or f"exam.{args.format}"
+    start = time.perf_counter()
+    try:
+        total = export(
+            output, args.format, args.per_category, args.seed, args.categories, args.difficulty,
+            args.workers, args.chunk_size, args.kb, args.title,
+        )
+    except ValueError as exc:
+        parser.error(str(exc))
+    print(f"Wrote {total} questions to {output} in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+
+from cases import CaseGenerator
+from distractors import DistractorIndex
+from knowledge_base import (
+    diff_diagnoses,
+    knowledge_base_hash,
+    knowledge_base_path,
+    knowledge_base_signature,
+    load_diagnoses,
+)
+from search import SearchIndex
+from snapshot import load_engine, save_snapshot, snapshot_path
+
+# ===== KNOWLEDGE BASE HOT RELOAD =====
+# The knowledge base and everything derived from it (case generator,
+# distractor index, search index) live in one immutable Engine tuple. A
+# watcher thread polls the data files' mtimes; when they change it reloads
+# them, diffs against the running knowledge base and derives a new Engine
+# that re-indexes only the changed entries. Publishing it is a single
+# attribute assignment, so a rerun sees either the old engine or the new one,
+# never a mix. Sessions keep their state: diagnosis ids are stable across
+# reloads and questions are only dropped if they show an edited entry.
+#
+# A file that fails to parse (e.g. saved half-way) is reported in
+# last_error and the running knowledge base stays in place. So is anything
+# else that goes wrong in a poll (the data directory missing mid-deploy, a
+# listener raising): the error is logged and the watcher keeps polling.
+#
+# The first engine comes from the precompiled snapshot when it is current
+# (see snapshot.py), and each reload refreshes the snapshot for the next
+# worker to start.
+
+RELOAD_INTERVAL = 2.0
+
+log = logging.getLogger(__name__)
+
+Engine = namedtuple("Engine", ["kb", "generator", "search"])
+
+
+def build_engine(kb):
+    return Engine(kb, CaseGenerator(kb, DistractorIndex(kb)), SearchIndex(kb))
+
+
+def update_engine(engine, diagnoses):
+    # (new engine, changed names, removed names); the same engine if nothing changed
+    changed, removed = diff_diagnoses(engine.kb.diagnoses, diagnoses)
+    if not changed and not removed:
+        return engine, changed, removed
+    kb = engine.kb.updated(diagnoses, changed, removed)
+    generator = engine.generator
+    names = generator.names + [dx for dx in changed if dx not in generator.ids]
+    distractors = None
+    if generator.distractors is not None:
+        distractors = generator.distractors.updated(kb, names, changed, removed)
+    return Engine(
+        kb,
+        generator.updated(kb, names, changed, removed, distractors),
+        engine.search.updated(kb, names, changed, removed),
+    ), changed, removed
+
+
+def reload_interval():
+    # TRAINER_KB_RELOAD_INTERVAL=0 turns the watcher off
+    return float(os.environ.get("TRAINER_KB_RELOAD_INTERVAL", RELOAD_INTERVAL))
+
+
+class KnowledgeBaseWatcher:
+    def __init__(self, path=None, interval=None):
+        self.path = path or knowledge_base_path()
+        self.interval = reload_interval() if interval is None else interval
+        self.signature = knowledge_base_signature(self.path)
+        self.engine, _ = load_engine(self.path)
+        self.listeners = []  # called as listener(engine, changed, removed)
+        self.last_error = None
+        self.last_reload = None  # (seconds taken, changed, removed)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="kb-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as exc:
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                log.exception("Knowledge base reload failed")
+
+    def check(self):
+        # Reload if the files changed since the last look; True if the engine was replaced
+        signature = knowledge_base_signature(self.path)
+        if signature == self.signature:
+            return False
+        return self.reload(signature)
+
+    def reload(self, signature=None):
+        with self._lock:
+            start = time.perf_counter()
+            self.signature = signature or knowledge_base_signature(self.path)
+            try:
+                # Hashed before reading: if the files change in between, the
+                # snapshot's stamp is already stale and the next poll reloads
+                source = knowledge_base_hash(self.path)
+                diagnoses = load_diagnoses(self.path)
+            except (OSError, ValueError) as exc:
+                self.last_error = str(exc)
+                log.warning("Knowledge base not reloaded: %s", exc)
+                return False
+            self.last_error = None
+            engine, changed, removed = update_engine(self.engine, diagnoses)
+            if engine is self.engine:
+                return False
+            # Listeners (the scheduler and adaptive model learning new ids)
+            # run before the engine is published, so a session that sees the
+            # new engine never draws an id they don't know yet
+            for listener in self.listeners:
+                listener(engine, changed, removed)
+            self.engine = engine
+            self.last_reload = (time.perf_counter() - start, len(changed), len(removed))
+            self._save_snapshot(source)
+            return True
+
+    def _save_snapshot(self, source):
+        path = snapshot_path(self.path)
+        if path:
+            try:
+                save_snapshot(self.engine, path, source)
+            except OSError as exc:
+                self.last_error = f"snapshot not saved: {exc}"
+                log.warning("Knowledge base %s", self.last_error)
@@ -0,0 +1,230 @@
+import hashlib
+import json
+import os
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    tomllib = None
+
+# ===== KNOWLEDGE BASE =====
+# Diagnoses live on disk under data/ as one JSON (or TOML) file per specialty
+# group. Each file maps a diagnosis name to its info dict:
+#   symptoms, key_finding, urgency, category, teaching
+# and optionally, for richer case vignettes:
+#   symptom_weights - one positive weight per symptom; heavier ones are shown
+#                     more often (default: all equal)
+#   findings        - exam findings (default: key_finding split on commas)
+#   age             - [min, max] years, 0 = infant
+#   sex             - "female" or "male"
+#   risk_factors    - history items revealed as the case unfolds
+# symptoms are presenting complaints only, and may be empty for a condition
+# found on screening; put "found on screening" under risk_factors instead.
+# Files are merged in filename order, so prefix them (01_, 02_, ...) to keep
+# the category order stable in the header and the Specialty Explorer.
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+URGENCY_TIERS = ["EMERGENT", "URGENT", "ROUTINE", "ELECTIVE"]
+
+REQUIRED_FIELDS = ("symptoms", "key_finding", "urgency", "category", "teaching")
+SEXES = ("female", "male")
+
+
+def urgency_tier(urgency):
+    # "EMERGENT - 4-6 hour window" -> "EMERGENT"
+    return urgency.split(" - ", 1)[0].strip().upper()
+
+
+def exam_findings(info):
+    return info.get("findings") or [part.strip() for part in info["key_finding"].split(",") if part.strip()]
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _field_error(info):
+    # Type and range checks, so a hand-edited entry fails here with its file
+    # and name rather than deep inside case generation (a string under
+    # symptoms would otherwise be dealt out one character at a time)
+    for field in ("symptoms", "teaching", "findings", "risk_factors"):
+        value = info.get(field, [])
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            return f"{field} must be a list of strings"
+    weights = info.get("symptom_weights")
+    if weights is not None and not (
+        isinstance(weights, list)
+        and len(weights) == len(info["symptoms"])
+        and all(_is_number(weight) and weight > 0 for weight in weights)
+    ):
+        return "symptom_weights needs one positive weight per symptom"
+    age = info.get("age")
+    if age is not None and not (
+        isinstance(age, list) and len(age) == 2 and all(map(_is_number, age)) and 0 <= age[0] <= age[1]
+    ):
+        return "age must be [min, max] years"
+    if info.get("sex", SEXES[0]) not in SEXES:
+        return f"sex must be one of {', '.join(SEXES)}"
+    return None
+
+
+def _index_keys(info):
+    # The index entries one diagnosis appears under
+    return {
+        "by_category": {info["category"]},
+        "by_symptom": {symptom.lower() for symptom in info["symptoms"]},
+        "by_urgency": {urgency_tier(info["urgency"])},
+    }
+
+
+class KnowledgeBase:
+    def __init__(self, diagnoses, version=0):
+        self.diagnoses = diagnoses
+        self.total_diagnoses = len(diagnoses)
+        # Bumped on every hot reload; caches keyed on it go stale together
+        self.version = version
+
+        # Prebuilt indexes, built once per load instead of on every rerun
+        self.categories = {}
+        self.by_category = {}
+        self.by_symptom = {}
+        self.by_urgency = {}
+        for dx, info in diagnoses.items():
+            cat = info["category"]
+            self.categories[cat] = self.categories.get(cat, 0) + 1
+            self.by_category.setdefault(cat, []).append(dx)
+            for symptom in info["symptoms"]:
+                self.by_symptom.setdefault(symptom.lower(), []).append(dx)
+            self.by_urgency.setdefault(urgency_tier(info["urgency"]), []).append(dx)
+
+    def __len__(self):
+        return self.total_diagnoses
+
+    def __contains__(self, dx):
+        return dx in self.diagnoses
+
+    def __getitem__(self, dx):
+        return self.diagnoses[dx]
+
+    def in_category(self, category):
+        return self.by_category.get(category, [])
+
+    def with_symptom(self, symptom):
+        return self.by_symptom.get(symptom.lower(), [])
+
+    def with_urgency(self, tier):
+        return self.by_urgency.get(tier.upper(), [])
+
+    def updated(self, diagnoses, changed, removed):
+        # A new KnowledgeBase for `diagnoses` that re-indexes only the changed
+        # and removed entries. Untouched index lists are shared with self and
+        # touched ones are replaced, never mutated, so sessions still holding
+        # the old object keep a consistent view.
+        kb = KnowledgeBase.__new__(KnowledgeBase)
+        kb.diagnoses = diagnoses
+        kb.total_diagnoses = len(diagnoses)
+        kb.version = self.version + 1
+        kb.categories = dict(self.categories)
+        kb.by_category = dict(self.by_category)
+        kb.by_symptom = dict(self.by_symptom)
+        kb.by_urgency = dict(self.by_urgency)
+        empty = {name: set() for name in ("by_category", "by_symptom", "by_urgency")}
+        for dx in [*changed, *removed]:
+            old = _index_keys(self.diagnoses[dx]) if dx in self.diagnoses else empty
+            new = _index_keys(diagnoses[dx]) if dx in diagnoses else empty
+            for name in old:
+                index = getattr(kb, name)
+                for key in old[name] - new[name]:
+                    remaining = [item for item in index[key] if item != dx]
+                    if remaining:
+                        index[key] = remaining
+                    else:
+                        del index[key]
+                for key in new[name] - old[name]:
+                    index[key] = index.get(key, []) + [dx]
+            for cat in old["by_category"] - new["by_category"]:
+                kb.categories[cat] -= 1
+                if not kb.categories[cat]:
+                    del kb.categories[cat]
+            for cat in new["by_category"] - old["by_category"]:
+                kb.categories[cat] = kb.categories.get(cat, 0) + 1
+        return kb
+
+
+def _read_file(path):
+    if path.endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def _kb_files(path):
+    if os.path.isfile(path):
+        return [path]
+    extensions = (".json", ".toml") if tomllib else (".json",)
+    return [
+        os.path.join(path, name)
+        for name in sorted(os.listdir(path))
+        if name.endswith(extensions)
+    ]
+
+
+def knowledge_base_signature(path=None):
+    # Cheap change detector for the reload watcher: (file, mtime, size) per file
+    path = path or knowledge_base_path()
+    signature = []
+    for file_path in _kb_files(path):
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            continue
+        signature.append((file_path, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def knowledge_base_hash(path=None):
+    # Content hash of the data files, for caches that must survive a redeploy
+    # (mtimes don't)
+    path = path or knowledge_base_path()
+    digest = hashlib.sha256()
+    for file_path in _kb_files(path):
+        digest.update(os.path.basename(file_path).encode() + b"\0")
+        with open(file_path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def diff_diagnoses(old, new):
+    # (changed or added names, removed names) between two diagnoses dicts
+    changed = [dx for dx, info in new.items() if old.get(dx) != info]
+    removed = [dx for dx in old if dx not in new]
+    return changed, removed
+
+
+def knowledge_base_path():
+    # TRAINER_KB_PATH points the app at another knowledge base (a directory or
+    # a single file), e.g. a private fork or a synthetic one for benchmarks
+    return os.environ.get("TRAINER_KB_PATH") or DEFAULT_PATH
+
+
+def load_diagnoses(path=None):
+    path = path or knowledge_base_path()
+    diagnoses = {}
+    for file_path in _kb_files(path):
+        for dx, info in _read_file(file_path).items():
+            missing = [field for field in REQUIRED_FIELDS if field not in info]
+            if missing:
+                raise ValueError(f"{file_path}: '{dx}' is missing {', '.join(missing)}")
+            error = _field_error(info)
+            if error:
+                raise ValueError(f"{file_path}: '{dx}' {error}")
+            if dx in diagnoses:
+                raise ValueError(f"{file_path}: duplicate diagnosis '{dx}'")
+            diagnoses[dx] = info
+    return diagnoses
+
+
+def load_knowledge_base(path=None):
+    return KnowledgeBase(load_diagnoses(path))
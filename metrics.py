@@ -0,0 +1,201 @@
+import atexit
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# ===== METRICS =====
+# Process-wide counters and latency histograms in the Prometheus text format.
+# Every session served by this process records into the same registry, so
+# the numbers describe the server, not one trainee. Two optional surfaces,
+# switched on by environment variables:
+#   TRAINER_METRICS_PORT    - serve /metrics over HTTP for a Prometheus scrape
+#   TRAINER_METRICS_ADDRESS - interface the HTTP server listens on (default
+#                             127.0.0.1; 0.0.0.0 for a scraper on another host)
+#   TRAINER_METRICS_PATH    - rewrite a .prom text file every few seconds, e.g.
+#                             for node_exporter's textfile collector
+# With several app processes on one host, give each its own port or path.
+
+SERVER_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+RESPONSE_BUCKETS = (2, 5, 10, 20, 30, 45, 60, 90, 120, 300)
+FILE_SINK_INTERVAL = 5.0
+METRICS_ADDRESS = "127.0.0.1"
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}  # label values -> count
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def lines(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            yield f"{self.name}{_labels(self.labels, label_values)} {value}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets, labels=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self._series = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, *label_values, count=1):
+        # count > 1 records `count` samples of `value`, e.g. one per question
+        # for a batch timed as a whole
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += count
+            series[-1] += value * count
+
+    @contextmanager
+    def time(self, *label_values):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def count(self, *label_values):
+        series = self._series.get(label_values)
+        return sum(series[:-1]) if series else 0
+
+    def lines(self):
+        with self._lock:
+            series = sorted((key, list(value)) for key, value in self._series.items())
+        for label_values, counts in series:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.labels, label_values, [('le', bound)])} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labels, label_values)} {counts[-1]}"
+            yield f"{self.name}_count{_labels(self.labels, label_values)} {cumulative}"
+
+
+# ----- trainer metrics -----
+# mode is "practice" or "exam"
+
+QUESTION_GENERATE = Histogram(
+    "trainer_question_generate_seconds", "Server time to generate one case", SERVER_BUCKETS, ["mode"]
+)
+QUESTION_RENDER = Histogram(
+    "trainer_question_render_seconds", "Server time to render one case to text", SERVER_BUCKETS, ["mode"]
+)
+ANSWER_GRADE = Histogram(
+    "trainer_answer_grade_seconds", "Server time to grade and record one answer", SERVER_BUCKETS, ["mode"]
+)
+RESPONSE_TIME = Histogram(
+    "trainer_response_seconds", "Time from a case being shown to the trainee submitting an answer",
+    RESPONSE_BUCKETS, ["mode"],
+)
+ANSWERS = Counter("trainer_answers_total", "Answers submitted", ["mode", "result"])
+EXAMS = Counter("trainer_exams_total", "Timed exams by outcome", ["event"])
+# event is "hit", "miss" or "eviction"
+EXPLANATION_CACHE = Counter(
+    "trainer_explanation_cache_total", "Shared explanation cache lookups and evictions", ["event"]
+)
+
+
+def render_text():
+    out = []
+    for metric in REGISTRY:
+        out.append(f"# HELP {metric.name} {metric.help}")
+        out.append(f"# TYPE {metric.name} {metric.kind}")
+        out.extend(metric.lines())
+    return "\n".join(out) + "\n"
+
+
+# ----- exporters -----
+
+def start_http_server(port, address=METRICS_ADDRESS):
+    # http.server is only imported by processes that serve metrics
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = render_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((address, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def write_text_file(path):
+    # Write then rename, so a scraper never reads a half-written file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render_text())
+    os.replace(tmp_path, path)
+
+
+def start_file_sink(path, interval=FILE_SINK_INTERVAL):
+    def run():
+        while True:
+            time.sleep(interval)
+            write_text_file(path)
+
+    threading.Thread(target=run, name="metrics-file", daemon=True).start()
+    atexit.register(write_text_file, path)
+
+
+def start_exporters():
+    # Starts whichever surfaces the environment asks for; returns their descriptions
+    started = []
+    port = os.environ.get("TRAINER_METRICS_PORT")
+    if port:
+        address = os.environ.get("TRAINER_METRICS_ADDRESS", METRICS_ADDRESS)
+        start_http_server(int(port), address)
+        started.append(f"http://{address}:{port}/metrics")
+    path = os.environ.get("TRAINER_METRICS_PATH")
+    if path:
+        start_file_sink(path)
+        started.append(path)
+    return started
@@ -0,0 +1,442 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+# ===== PERSISTENT PROGRESS STORE =====
+# Every answered question is recorded as an event. Writes go into an
+# in-memory queue and a background thread flushes them in batches, so the
+# Submit button never waits on disk. Reads come from a per-user aggregate
+# that is loaded from the backend and then kept current in memory; it is
+# re-read after STATS_TTL seconds, so answers and resets made through another
+# app worker show up within that time.
+#
+# Backends:
+#   sqlite - default, WAL mode; several app workers on one host can share it
+#   file   - JSON-lines stand-in for tests and throwaway local runs
+#
+# For cohort analytics the SQLite backend also keeps a rollup of answer
+# counts per (user, diagnosis, chosen, category), upserted with each batch,
+# so program-wide dashboards read a few thousand integer rows instead of
+# scanning every event. Names are stored once in a dictionary table.
+#
+# A batch that fails to write (a locked database, a full disk) is logged and
+# retried with the next write, up to WRITE_ATTEMPTS times, then counted in
+# `dropped` and discarded. The writer thread itself never stops.
+
+DEFAULT_DIR = os.path.dirname(os.path.abspath(__file__))
+FLUSH_INTERVAL = 1.0
+FLUSH_BATCH_SIZE = 256
+WRITE_ATTEMPTS = 3
+STATS_TTL = 30.0
+
+log = logging.getLogger(__name__)
+
+
+EVENT_FIELDS = ("user_id", "diagnosis", "chosen", "correct", "latency", "category", "answered_at")
+
+
+def make_event(user_id, diagnosis, chosen, latency, category, answered_at=None):
+    return {
+        "user_id": user_id,
+        "diagnosis": diagnosis,
+        "chosen": chosen,
+        "correct": chosen == diagnosis,
+        "latency": latency,
+        "category": category,
+        "answered_at": time.time() if answered_at is None else answered_at,
+    }
+
+
+class UserStats:
+    def __init__(self, reset_at=0.0):
+        self.answered = 0
+        self.correct = 0
+        self.categories = {}  # category -> [answered, correct]
+        self.reset_at = reset_at  # time of the last reset, 0 = never
+        self.loaded_at = time.monotonic()
+
+    @property
+    def accuracy(self):
+        return self.correct / self.answered * 100 if self.answered else 0.0
+
+    def add(self, category, answered, correct):
+        self.answered += answered
+        self.correct += correct
+        counts = self.categories.setdefault(category, [0, 0])
+        counts[0] += answered
+        counts[1] += correct
+
+
+class ProgressStore:
+    # Subclasses implement _write_batch, _load_stats and _write_reset
+    def __init__(self, flush_interval=FLUSH_INTERVAL, batch_size=FLUSH_BATCH_SIZE, stats_ttl=STATS_TTL):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.stats_ttl = stats_ttl
+        self._queue = queue.Queue()
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._failed = []  # events of the last failed write, retried first
+        self._attempts = 0
+        self.dropped = 0  # events given up on after WRITE_ATTEMPTS failures
+        self._writer = threading.Thread(target=self._run, name="progress-writer", daemon=True)
+        self._writer.start()
+        # Anything still buffered when the server shuts down is written out
+        atexit.register(self.close)
+
+    def record(self, event):
+        stats = self.summary(event["user_id"])
+        with self._stats_lock:
+            stats.add(event["category"], 1, int(event["correct"]))
+        self._queue.put(event)
+
+    def summary(self, user_id):
+        stats = self._stats.get(user_id)
+        if stats is None:
+            with self._io_lock:
+                loaded = self._load_stats(user_id)
+            with self._stats_lock:
+                stats = self._stats.setdefault(user_id, loaded)
+        elif time.monotonic() - stats.loaded_at > self.stats_ttl:
+            # This process's own answers are written first, so the re-read
+            # has them as well as other workers'
+            self.flush()
+            with self._io_lock:
+                stats = self._load_stats(user_id)
+            with self._stats_lock:
+                self._stats[user_id] = stats
+        return stats
+
+    def history(self, user_id):
+        # (diagnosis, correct, answered_at) since the last reset, oldest first
+        self.flush()
+        with self._io_lock:
+            return self._load_history(user_id)
+
+    def reset(self, user_id):
+        # History is kept for analytics; the user's running totals restart
+        self.flush()
+        reset_at = time.time()
+        with self._io_lock:
+            self._write_reset(user_id, reset_at)
+        with self._stats_lock:
+            self._stats[user_id] = UserStats(reset_at)
+
+    def rollup(self):
+        # ([(user, diagnosis, chosen, category, answered, latency_sum, latency_count)],
+        #  {id: name}) over all history, resets included; see analytics.py
+        self.flush()
+        with self._io_lock:
+            return self._load_rollup()
+
+    def flush(self):
+        # Returns once everything recorded before the call is written,
+        # including a batch the writer thread is still collecting. The marker
+        # makes the writer write right away and is set with that batch, so
+        # events other sessions record meanwhile don't hold the caller up.
+        # A failed write also sets it; the events are retried later.
+        if self._closed.is_set():
+            self._drain()
+            return
+        written = threading.Event()
+        self._queue.put(written)
+        while not written.wait(self.flush_interval):
+            if not self._writer.is_alive():
+                # Closed after the marker went in, past close()'s own drain,
+                # or the writer died: write on this thread instead
+                self._drain()
+
+    def _drain(self):
+        items = []
+        while True:
+            try:
+                items.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._write_items(items)
+
+    def _write_items(self, items):
+        # Queue items are events and flush markers (threading.Event); markers
+        # are set even if the write fails, so flush() never waits forever
+        try:
+            with self._io_lock:
+                batch = self._failed + [item for item in items if not isinstance(item, threading.Event)]
+                if batch:
+                    self._write_or_keep(batch)
+        finally:
+            for item in items:
+                if isinstance(item, threading.Event):
+                    item.set()
+
+    def _write_or_keep(self, batch):
+        # Called under _io_lock
+        try:
+            self._write_batch(batch)
+        except Exception:
+            self._attempts += 1
+            if self._attempts < WRITE_ATTEMPTS:
+                log.exception("Writing %d answers failed (attempt %d); will retry", len(batch), self._attempts)
+                self._failed = batch
+                return
+            log.exception("Writing %d answers failed %d times; dropping them", len(batch), self._attempts)
+            self.dropped += len(batch)
+        self._failed = []
+        self._attempts = 0
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._writer.join()
+        self._drain()
+
+    def _run(self):
+        while not self._closed.is_set():
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if self._failed:
+                    self._write_items([])
+                continue
+            items = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while not isinstance(items[-1], threading.Event) and len(items) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write_items(items)
+
+    def _write_batch(self, events):
+        raise NotImplementedError
+
+    def _load_stats(self, user_id):
+        raise NotImplementedError
+
+    def _load_history(self, user_id):
+        raise NotImplementedError
+
+    def _write_reset(self, user_id, reset_at):
+        raise NotImplementedError
+
+    def _load_rollup(self):
+        raise NotImplementedError
+
+
+def _rollup_events(events):
+    # {(user_id, diagnosis, chosen, category): [answered, latency_sum, latency_count]}
+    rollup = {}
+    for event in events:
+        row = rollup.setdefault((event["user_id"], event["diagnosis"], event["chosen"], event["category"]), [0, 0.0, 0])
+        row[0] += 1
+        if event["latency"] is not None:
+            row[1] += event["latency"]
+            row[2] += 1
+    return rollup
+
+
+class SQLiteProgressStore(ProgressStore):
+    def __init__(self, path, **kwargs):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        has_rollup = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'answer_rollup'"
+        ).fetchone()
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS answers (
+                id INTEGER PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                diagnosis TEXT NOT NULL,
+                chosen TEXT NOT NULL,
+                correct INTEGER NOT NULL,
+                latency REAL,
+                category TEXT NOT NULL,
+                answered_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS answers_user ON answers (user_id, answered_at);
+            CREATE TABLE IF NOT EXISTS resets (
+                user_id TEXT PRIMARY KEY,
+                reset_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS names (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE
+            );
+            CREATE TABLE IF NOT EXISTS answer_rollup (
+                user_id INTEGER NOT NULL,
+                diagnosis INTEGER NOT NULL,
+                chosen INTEGER NOT NULL,
+                category INTEGER NOT NULL,
+                answered INTEGER NOT NULL,
+                latency_sum REAL NOT NULL,
+                latency_count INTEGER NOT NULL,
+                PRIMARY KEY (user_id, diagnosis, chosen, category)
+            ) WITHOUT ROWID;
+        """)
+        if not has_rollup:
+            self._backfill_rollup()
+        self._name_ids = dict(self._conn.execute("SELECT name, id FROM names"))
+        super().__init__(**kwargs)
+
+    def _backfill_rollup(self):
+        # Databases written before the rollup existed are summarized once
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO names (name) "
+                "SELECT user_id FROM answers UNION SELECT diagnosis FROM answers "
+                "UNION SELECT chosen FROM answers UNION SELECT category FROM answers"
+            )
+            self._conn.execute(
+                "INSERT INTO answer_rollup "
+                "SELECT u.id, d.id, c.id, g.id, COUNT(*), TOTAL(a.latency), COUNT(a.latency) FROM answers a "
+                "JOIN names u ON u.name = a.user_id JOIN names d ON d.name = a.diagnosis "
+                "JOIN names c ON c.name = a.chosen JOIN names g ON g.name = a.category "
+                "GROUP BY u.id, d.id, c.id, g.id"
+            )
+
+    def _ids(self, names):
+        missing = [name for name in names if name not in self._name_ids]
+        if missing:
+            self._conn.executemany("INSERT OR IGNORE INTO names (name) VALUES (?)", [(name,) for name in missing])
+            for name in missing:
+                self._name_ids[name] = self._conn.execute("SELECT id FROM names WHERE name = ?", (name,)).fetchone()[0]
+        return [self._name_ids[name] for name in names]
+
+    def _write_batch(self, events):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO answers (user_id, diagnosis, chosen, correct, latency, category, answered_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [tuple(int(e[f]) if f == "correct" else e[f] for f in EVENT_FIELDS) for e in events],
+            )
+            self._conn.executemany(
+                "INSERT INTO answer_rollup VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (user_id, diagnosis, chosen, category) DO UPDATE SET "
+                "answered = answered + excluded.answered, "
+                "latency_sum = latency_sum + excluded.latency_sum, "
+                "latency_count = latency_count + excluded.latency_count",
+                [(*self._ids(key), *values) for key, values in _rollup_events(events).items()],
+            )
+
+    def _load_stats(self, user_id):
+        reset = self._conn.execute("SELECT reset_at FROM resets WHERE user_id = ?", (user_id,)).fetchone()
+        stats = UserStats(reset[0] if reset else 0.0)
+        rows = self._conn.execute(
+            "SELECT category, COUNT(*), SUM(correct) FROM answers "
+            "WHERE user_id = ? AND answered_at > ? GROUP BY category",
+            (user_id, stats.reset_at),
+        )
+        for category, answered, correct in rows:
+            stats.add(category, answered, correct)
+        return stats
+
+    def _load_history(self, user_id):
+        rows = self._conn.execute(
+            "SELECT diagnosis, correct, answered_at FROM answers "
+            "WHERE user_id = ? AND answered_at > "
+            "COALESCE((SELECT reset_at FROM resets WHERE user_id = ?), 0) "
+            "ORDER BY answered_at",
+            (user_id, user_id),
+        )
+        return [(diagnosis, bool(correct), answered_at) for diagnosis, correct, answered_at in rows]
+
+    def _write_reset(self, user_id, reset_at):
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO resets (user_id, reset_at) VALUES (?, ?)",
+                (user_id, reset_at),
+            )
+
+    def _load_rollup(self):
+        names = dict(self._conn.execute("SELECT id, name FROM names"))
+        rows = self._conn.execute(
+            "SELECT user_id, diagnosis, chosen, category, answered, latency_sum, latency_count FROM answer_rollup"
+        ).fetchall()
+        return rows, names
+
+    def close(self):
+        if self._closed.is_set():
+            return
+        super().close()
+        self._conn.close()
+
+
+class FileProgressStore(ProgressStore):
+    # One JSON object per line; resets are stored as {"reset": user_id, ...}
+    def __init__(self, path, **kwargs):
+        self.path = path
+        super().__init__(**kwargs)
+
+    def _write_batch(self, events):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+
+    def _load_stats(self, user_id):
+        stats = UserStats()
+        if not os.path.exists(self.path):
+            return stats
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get("reset") == user_id:
+                    stats = UserStats(record["reset_at"])
+                elif record.get("user_id") == user_id:
+                    stats.add(record["category"], 1, int(record["correct"]))
+        return stats
+
+    def _load_history(self, user_id):
+        history = []
+        if not os.path.exists(self.path):
+            return history
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get("reset") == user_id:
+                    history = []
+                elif record.get("user_id") == user_id:
+                    history.append((record["diagnosis"], record["correct"], record["answered_at"]))
+        return history
+
+    def _write_reset(self, user_id, reset_at):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"reset": user_id, "reset_at": reset_at}) + "\n")
+
+    def _load_rollup(self):
+        # No stored rollup here; the whole file is summarized on each call
+        events = []
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                events = [record for record in map(json.loads, f) if "reset" not in record]
+        ids = {}
+        rows = []
+        for key, values in _rollup_events(events).items():
+            rows.append((*(ids.setdefault(name, len(ids) + 1) for name in key), *values))
+        return rows, {i: name for name, i in ids.items()}
+
+
+PROGRESS_BACKENDS = {
+    "sqlite": (SQLiteProgressStore, "progress.db"),
+    "file": (FileProgressStore, "progress.jsonl"),
+}
+
+
+def open_progress_store(backend=None, path=None):
+    backend = backend or os.environ.get("TRAINER_PROGRESS_BACKEND", "sqlite")
+    if backend not in PROGRESS_BACKENDS:
+        raise ValueError(f"Unknown progress backend: {backend}")
+    store_class, default_name = PROGRESS_BACKENDS[backend]
+    path = path or os.environ.get("TRAINER_PROGRESS_PATH") or os.path.join(DEFAULT_DIR, default_name)
+    return store_class(path)
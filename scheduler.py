@@ -0,0 +1,155 @@
+import heapq
+import random
+import threading
+import time
+
+# ===== SPACED-REPETITION SCHEDULER =====
+# Leitner-style boxes driven by the Submit Diagnosis outcome: a correct answer
+# moves the diagnosis up one box (longer interval), a wrong one sends it back
+# to box 0. Each user keeps one min-heap of (due, diagnosis id) per category,
+# so picking the next case is O(log n) plus a glance at each category's heap
+# top; nothing rescans the answer history on a rerun.
+#
+# Heaps use lazy deletion: rescheduling pushes a fresh entry and the old one
+# is skipped when it surfaces (its due time no longer matches the card).
+# The same check drops cards whose diagnosis a knowledge-base reload removed
+# or moved to another category; a moved card is re-filed under its new
+# category when the reload comes in.
+#
+# A trainee's past answers are replayed by add_user, outside the lock, so
+# reading their history from disk never holds up other sessions; the app
+# calls it before the trainee's first pick or answer.
+
+BOX_INTERVALS = [60, 10 * 60, 60 * 60, 24 * 3600, 3 * 24 * 3600, 7 * 24 * 3600, 21 * 24 * 3600]
+NEW_CARD_TRIES = 32
+
+
+class UserSchedule:
+    __slots__ = ("cards", "heaps")
+
+    def __init__(self):
+        self.cards = {}  # dx id -> (box, due)
+        self.heaps = {}  # category -> [(due, dx id), ...]
+
+
+class Scheduler:
+    def __init__(self, categories, seed=None):
+        # categories[dx_id] is the category of each diagnosis id, None for
+        # ids a knowledge-base reload removed
+        self._users = {}
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._set_categories(categories)
+
+    def _set_categories(self, categories):
+        self.category_of = list(categories)
+        self.by_category = {}
+        for dx_id, category in enumerate(self.category_of):
+            if category is not None:
+                self.by_category.setdefault(category, []).append(dx_id)
+        self.active_ids = [dx_id for dx_id, category in enumerate(self.category_of) if category is not None]
+
+    def update_categories(self, categories):
+        # After a knowledge-base reload; existing ids keep their cards
+        with self._lock:
+            old = self.category_of
+            self._set_categories(categories)
+            moved = [
+                dx_id for dx_id, category in enumerate(old)
+                if self.category_of[dx_id] not in (None, category)
+            ]
+            for schedule in self._users.values():
+                for dx_id in moved:
+                    card = schedule.cards.get(dx_id)
+                    if card:
+                        heap = schedule.heaps.setdefault(self.category_of[dx_id], [])
+                        heapq.heappush(heap, (card[1], dx_id))
+
+    def has_user(self, user_id):
+        return user_id in self._users
+
+    def add_user(self, user_id, history):
+        # history: (dx id, correct, answered_at) oldest first. Replayed into a
+        # private schedule, then published; if another session added the
+        # same trainee meanwhile, theirs is kept
+        schedule = UserSchedule()
+        for dx_id, correct, answered_at in history:
+            if dx_id < len(self.category_of):
+                self._apply(schedule, dx_id, correct, answered_at)
+        with self._lock:
+            self._users.setdefault(user_id, schedule)
+
+    def _user(self, user_id):
+        # A trainee nobody called add_user for starts with no history
+        schedule = self._users.get(user_id)
+        if schedule is None:
+            schedule = self._users[user_id] = UserSchedule()
+        return schedule
+
+    def _apply(self, schedule, dx_id, correct, now):
+        if self.category_of[dx_id] is None:
+            return
+        box, _ = schedule.cards.get(dx_id, (0, None))
+        box = min(box + 1, len(BOX_INTERVALS) - 1) if correct else 0
+        due = now + BOX_INTERVALS[box]
+        schedule.cards[dx_id] = (box, due)
+        heap = schedule.heaps.setdefault(self.category_of[dx_id], [])
+        heapq.heappush(heap, (due, dx_id))
+        # Keep stale entries from piling up in heavily drilled categories
+        if len(heap) > 2 * len(self.by_category[self.category_of[dx_id]]):
+            live = [(d, i) for d, i in heap if schedule.cards[i][1] == d]
+            heapq.heapify(live)
+            schedule.heaps[self.category_of[dx_id]] = live
+
+    def record(self, user_id, dx_id, correct, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._apply(self._user(user_id), dx_id, correct, now)
+
+    def reset(self, user_id):
+        with self._lock:
+            self._users[user_id] = UserSchedule()
+
+    def _heap_top(self, schedule, category):
+        heap = schedule.heaps.get(category)
+        while heap:
+            due, dx_id = heap[0]
+            if schedule.cards[dx_id][1] == due and self.category_of[dx_id] == category:
+                return due, dx_id
+            heapq.heappop(heap)
+        return None
+
+    def _new_card(self, schedule, category):
+        pool = self.by_category[category] if category else self.active_ids
+        for _ in range(NEW_CARD_TRIES):
+            dx_id = pool[self._rng.randrange(len(pool))]
+            if dx_id not in schedule.cards:
+                return dx_id
+        return None
+
+    def next(self, user_id, category=None, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            schedule = self._user(user_id)
+            categories = [category] if category else self.by_category
+            tops = [top for top in (self._heap_top(schedule, c) for c in categories) if top]
+            earliest = min(tops) if tops else None
+            if earliest and earliest[0] <= now:
+                return earliest[1]
+            dx_id = self._new_card(schedule, category)
+            if dx_id is not None:
+                return dx_id
+            if earliest:
+                return earliest[1]
+            pool = self.by_category[category] if category else self.active_ids
+            return self._rng.choice(pool)
+
+    def weak_category(self, category_stats):
+        # Sample a category weighted by its smoothed error rate, using the
+        # same per-category [answered, correct] counts the sidebar shows
+        categories = list(self.by_category)
+        weights = []
+        for category in categories:
+            answered, correct = category_stats.get(category, (0, 0))
+            weights.append(1 - (correct + 1) / (answered + 2))
+        return self._rng.choices(categories, weights)[0]
@@ -0,0 +1,194 @@
+import bisect
+import copy
+import heapq
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+# ===== DIAGNOSIS SEARCH =====
+# A tokenized inverted index over diagnosis names, symptoms, key findings and
+# teaching points, built once per knowledge base. Query terms are matched
+# three ways, best first:
+#   exact  - the term is in the vocabulary
+#   prefix - the last term is still being typed ("cher" -> "cherry")
+#   fuzzy  - vocabulary terms sharing enough character trigrams ("cheery")
+# Scores are tf-idf with per-field weights, so a hit in the name outranks
+# the same word in a teaching point.
+#
+# Postings keep raw field-weighted term frequencies and idf is applied at
+# query time, so a knowledge-base reload only re-indexes the edited entries.
+
+FIELD_WEIGHTS = {"name": 3.0, "symptoms": 2.0, "key_finding": 2.0, "teaching": 1.0}
+PREFIX_WEIGHT = 0.8
+FUZZY_MIN_SIMILARITY = 0.4
+FUZZY_MAX_TERMS = 5
+PREFIX_MAX_TERMS = 20
+RESULT_LIMIT = 20
+SEARCH_CACHE_SIZE = 1024
+
+STOPWORDS = {"a", "an", "and", "for", "in", "is", "of", "on", "or", "the", "to", "with"}
+
+_token_re = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return [token for token in _token_re.findall(text.lower()) if token not in STOPWORDS]
+
+
+def trigrams(term):
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _field_texts(dx, info):
+    return {
+        "name": dx,
+        "symptoms": " ".join(info["symptoms"]),
+        "key_finding": info["key_finding"],
+        "teaching": " ".join(info["teaching"]),
+    }
+
+
+def _term_weights(dx, info):
+    # {term: field-weighted term frequency} for one diagnosis
+    weights = {}
+    for field, text in _field_texts(dx, info).items():
+        for token in tokenize(text):
+            weights[token] = weights.get(token, 0.0) + FIELD_WEIGHTS[field]
+    return weights
+
+
+class SearchIndex:
+    def __init__(self, kb):
+        self.names = list(kb.diagnoses)
+        self.category_of = [kb[dx]["category"] for dx in self.names]
+        self.total = len(self.names)
+        # Reruns repeat the same query many times; answer those from memory
+        self.search = lru_cache(maxsize=SEARCH_CACHE_SIZE)(self._search)
+        self.postings = {}  # term -> {dx id: field-weighted term frequency}
+        self.doc_terms = []  # dx id -> terms, to unindex an entry on reload
+        for dx_id, dx in enumerate(self.names):
+            weights = _term_weights(dx, kb[dx])
+            for term, tf in weights.items():
+                self.postings.setdefault(term, {})[dx_id] = tf
+            self.doc_terms.append(tuple(weights))
+
+        self.vocabulary = sorted(self.postings)
+        self.trigram_index = {}  # trigram -> [term, ...]
+        for term in self.vocabulary:
+            for gram in trigrams(term):
+                self.trigram_index.setdefault(gram, []).append(term)
+
+    def __getstate__(self):
+        # The per-index query cache is rebuilt empty rather than pickled
+        state = dict(self.__dict__)
+        del state["search"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.search = lru_cache(maxsize=SEARCH_CACHE_SIZE)(self._search)
+
+    def updated(self, kb, names, changed, removed):
+        # Copy of the index for a reloaded knowledge base. `names` is the old
+        # id order plus added diagnoses at the end; removed ids stay unused.
+        # Postings and trigram lists are copied only where an entry touched them.
+        index = copy.copy(self)
+        index.search = lru_cache(maxsize=SEARCH_CACHE_SIZE)(index._search)
+        index.names = names
+        added = len(names) - len(self.names)
+        index.category_of = self.category_of + [None] * added
+        index.doc_terms = self.doc_terms + [()] * added
+        index.total = len(kb.diagnoses)
+        index.postings = dict(self.postings)
+        ids = {dx: i for i, dx in enumerate(names)}
+        new_terms = set()
+        for dx in [*changed, *removed]:
+            dx_id = ids[dx]
+            for term in index.doc_terms[dx_id]:
+                postings = dict(index.postings[term])
+                del postings[dx_id]
+                index.postings[term] = postings
+            weights = _term_weights(dx, kb[dx]) if dx in kb else {}
+            for term, tf in weights.items():
+                postings = dict(index.postings.get(term, {}))
+                postings[dx_id] = tf
+                index.postings[term] = postings
+                new_terms.add(term)
+            index.doc_terms[dx_id] = tuple(weights)
+            index.category_of[dx_id] = kb[dx]["category"] if dx in kb else None
+
+        dropped = {term for term, postings in index.postings.items() if not postings}
+        for term in dropped:
+            del index.postings[term]
+        added_terms = {term for term in new_terms if term not in self.postings}
+        if dropped or added_terms:
+            index.vocabulary = sorted((set(self.vocabulary) - dropped) | added_terms)
+            index.trigram_index = dict(self.trigram_index)
+            for term in dropped:
+                for gram in trigrams(term):
+                    index.trigram_index[gram] = [t for t in index.trigram_index[gram] if t != term]
+            for term in added_terms:
+                for gram in trigrams(term):
+                    index.trigram_index[gram] = index.trigram_index.get(gram, []) + [term]
+        return index
+
+    def _prefix_terms(self, prefix):
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        terms = []
+        for term in self.vocabulary[start:start + PREFIX_MAX_TERMS]:
+            if not term.startswith(prefix):
+                break
+            if term != prefix:
+                terms.append((term, PREFIX_WEIGHT))
+        return terms
+
+    def _fuzzy_terms(self, token):
+        grams = trigrams(token)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.trigram_index.get(gram, ()))
+        matches = []
+        for term, count in shared.items():
+            similarity = count / (len(grams) + len(trigrams(term)) - count)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                matches.append((similarity, term))
+        matches.sort(reverse=True)
+        return [(term, similarity) for similarity, term in matches[:FUZZY_MAX_TERMS]]
+
+    def expand(self, token, is_last=False):
+        # (vocabulary term, weight) pairs a query token should match
+        terms = [(token, 1.0)] if token in self.postings else []
+        if is_last and len(token) >= 2:
+            terms.extend(self._prefix_terms(token))
+        if not terms and len(token) >= 3:
+            terms = self._fuzzy_terms(token)
+        return terms
+
+    def _search(self, query, limit=RESULT_LIMIT, category=None):
+        # Ranked ((diagnosis name, score), ...), optionally within one category
+        tokens = tokenize(query)
+        scores = {}
+        for position, token in enumerate(tokens):
+            # A trailing space means the last word is finished
+            is_last = position == len(tokens) - 1 and not query.endswith(" ")
+            best = {}
+            for term, weight in self.expand(token, is_last):
+                postings = self.postings[term]
+                idf = math.log(1 + self.total / len(postings))
+                for dx_id, tf in postings.items():
+                    best[dx_id] = max(best.get(dx_id, 0.0), tf * idf * weight)
+            for dx_id, score in best.items():
+                scores[dx_id] = scores.get(dx_id, 0.0) + score
+        if category is None:
+            ranked = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        else:
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        results = []
+        for dx_id, score in ranked:
+            if category is None or self.category_of[dx_id] == category:
+                results.append((self.names[dx_id], score))
+                if len(results) == limit:
+                    break
+        return tuple(results)
@@ -0,0 +1,119 @@
+import argparse
+import hashlib
+import os
+import pickle
+import sys
+import time
+
+from knowledge_base import KnowledgeBase, knowledge_base_hash, knowledge_base_path, load_diagnoses
+
+# ===== KNOWLEDGE BASE SNAPSHOT =====
+# A pickle of the whole engine (knowledge base, case generator, distractor
+# and search indexes), so a new worker skips parsing the data files and
+# rebuilding the similarity ranking. It is stamped with SNAPSHOT_FORMAT, a
+# hash of the data files' contents and a hash of the source of the modules
+# whose objects it pickles (ENGINE_MODULES); a snapshot that doesn't match
+# all three is ignored and rebuilt, so a deploy that changes a pickled class
+# never loads an engine built by the old code.
+#
+# Precompile one at deploy time so the first worker starts warm too:
+#
+#   python snapshot.py [--kb data/] [-o snapshot.pickle]
+
+SNAPSHOT_FORMAT = 3
+ROOT = os.path.dirname(os.path.abspath(__file__))
+SNAPSHOT_DIR = os.path.join(ROOT, ".kb_snapshots")
+ENGINE_MODULES = ("cases", "distractors", "hot_reload", "knowledge_base", "search")
+
+_code_hash = None
+
+
+def code_hash():
+    # sha256 of the ENGINE_MODULES sources, read once per process
+    global _code_hash
+    if _code_hash is None:
+        digest = hashlib.sha256()
+        for name in ENGINE_MODULES:
+            with open(os.path.join(ROOT, f"{name}.py"), "rb") as f:
+                digest.update(name.encode() + b"\0" + f.read())
+        _code_hash = digest.hexdigest()
+    return _code_hash
+
+
+def snapshot_path(kb_path=None):
+    # One snapshot per knowledge-base path under SNAPSHOT_DIR, unless
+    # TRAINER_KB_SNAPSHOT names a file; TRAINER_KB_SNAPSHOT=off turns them off
+    path = os.environ.get("TRAINER_KB_SNAPSHOT")
+    if path:
+        return None if path.lower() == "off" else path
+    kb_path = os.path.abspath(kb_path or knowledge_base_path())
+    return os.path.join(SNAPSHOT_DIR, hashlib.sha256(kb_path.encode()).hexdigest()[:16] + ".pickle")
+
+
+def save_snapshot(engine, path, source):
+    # Write then rename, so a worker starting alongside never reads half a file
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        # The stamp is its own record, read before any engine object is built
+        pickle.dump((SNAPSHOT_FORMAT, code_hash(), source), f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(engine, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path, source):
+    # The pickled engine, or None if it is missing, stale or unreadable
+    try:
+        with open(path, "rb") as f:
+            if pickle.load(f) != (SNAPSHOT_FORMAT, code_hash(), source):
+                return None
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, ValueError):
+        return None
+
+
+def load_engine(kb_path=None, path=None):
+    # (engine, source hash) from the snapshot when it is current; otherwise
+    # built from the data files and saved for the next worker
+    from hot_reload import build_engine
+
+    kb_path = kb_path or knowledge_base_path()
+    path = snapshot_path(kb_path) if path is None else path
+    source = knowledge_base_hash(kb_path)
+    if path:
+        engine = load_snapshot(path, source)
+        if engine is not None:
+            return engine, source
+    engine = build_engine(KnowledgeBase(load_diagnoses(kb_path)))
+    if path:
+        try:
+            save_snapshot(engine, path, source)
+        except OSError:
+            pass  # read-only deploy; build again next time
+    return engine, source
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompile the knowledge-base snapshot")
+    parser.add_argument("--kb", help="knowledge base directory or file")
+    parser.add_argument("-o", "--output", help="snapshot path (default: where the app looks for it)")
+    args = parser.parse_args(argv)
+
+    from hot_reload import build_engine
+
+    kb_path = args.kb or knowledge_base_path()
+    output = args.output or snapshot_path(kb_path)
+    if output is None:
+        parser.error("snapshots are turned off (TRAINER_KB_SNAPSHOT=off)")
+    start = time.perf_counter()
+    engine = build_engine(KnowledgeBase(load_diagnoses(kb_path)))
+    save_snapshot(engine, output, knowledge_base_hash(kb_path))
+    print(
+        f"Wrote snapshot of {engine.kb.total_diagnoses} diagnoses to {output} "
+        f"({os.path.getsize(output) / 1024:.0f} KB) in {time.perf_counter() - start:.2f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
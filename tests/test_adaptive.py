@@ -0,0 +1,54 @@
+import numpy as np
+
+from adaptive import AdaptiveModel, success_logit
+
+
+def test_a_correct_answer_raises_ability_and_lowers_difficulty():
+    model = AdaptiveModel(["Retina", "Retina"], seed=0)
+    model.record("pgy1-a", 0, True)
+    assert model._users["pgy1-a"].theta > 0 and model.difficulty[0] < 0
+    model.record("pgy1-b", 1, False)
+    assert model._users["pgy1-b"].theta < 0 and model.difficulty[1] > 0
+
+
+def test_replaying_a_history_moves_only_the_trainee():
+    model = AdaptiveModel(["Retina", "Cornea"], item_counts=[(0, 10, 3), (1, 10, 9)], seed=0)
+    difficulty = model.difficulty.copy()
+    item_answers = model.item_answers.copy()
+    model.add_user("pgy1-a", [(0, True, 1.0), (1, True, 2.0), (0, True, 3.0)])
+    assert model._users["pgy1-a"].theta > 0
+    assert model._users["pgy1-a"].answered == 3
+    assert np.array_equal(model.difficulty, difficulty)
+    assert np.array_equal(model.item_answers, item_answers)
+
+
+def test_next_favours_the_target_difficulty_and_never_repeats():
+    model = AdaptiveModel(["Retina"] * 17, seed=0)
+    model.difficulty[:] = np.linspace(-4, 4, 17)
+    # theta = 0, so the target difficulty is -success_logit(target)
+    target = -success_logit(0.7)
+    picks = [model.next("pgy1-a") for _ in range(500)]
+    assert all(a != b for a, b in zip(picks, picks[1:]))
+    gaps = np.abs(model.difficulty[picks] - target)
+    assert np.mean(gaps) < 0.75
+    assert np.bincount(picks, minlength=17).argmax() in np.argsort(np.abs(model.difficulty - target))[:2]
+
+
+def test_next_does_not_repeat_when_nothing_is_near_the_target():
+    model = AdaptiveModel(["Retina"] * 2, seed=0)
+    model.difficulty[:] = [40.0, 50.0]
+    picks = [model.next("pgy1-a") for _ in range(4)]
+    assert picks == [0, 1, 0, 1]
+
+
+def test_a_reload_extends_the_arrays_and_keeps_estimates():
+    model = AdaptiveModel(["Retina", "Cornea"], seed=0)
+    model.record("pgy1-a", 1, True)
+    difficulty = model.difficulty[1]
+    model.update_categories(["Retina", None, "Cornea", "Glaucoma"])
+    assert len(model.difficulty) == len(model.item_answers) == 4
+    assert model.difficulty[1] == difficulty and model.item_answers[1] == 1
+    assert model.difficulty[3] == 0 and model.item_answers[3] == 0
+    assert sorted(model.active_ids.tolist()) == [0, 2, 3]
+    assert model.by_category["Glaucoma"].tolist() == [3]
+    assert all(model.next("pgy1-a", category="Cornea") == 2 for _ in range(3))
@@ -0,0 +1,24 @@
+from analytics import UNKNOWN_URGENCY, AnswerRollup
+from knowledge_base import KnowledgeBase
+from progress import FileProgressStore, make_event
+
+
+def diagnosis(urgency):
+    return {"symptoms": ["pain"], "key_finding": "edema", "urgency": urgency, "category": "Cornea", "teaching": []}
+
+
+def test_unknown_urgency_tiers_are_grouped_not_fatal(tmp_path):
+    kb = KnowledgeBase({
+        "Keratitis": diagnosis("URGENT - same day"),
+        "Corneal Abrasion": diagnosis("SEMI-URGENT - within a week"),
+    })
+    store = FileProgressStore(str(tmp_path / "progress.jsonl"))
+    try:
+        store.record(make_event("pgy1-a", "Keratitis", "Keratitis", 3.0, "Cornea"))
+        store.record(make_event("pgy1-a", "Corneal Abrasion", "Keratitis", 5.0, "Cornea"))
+        store.record(make_event("pgy1-a", "Retired Diagnosis", "Keratitis", 4.0, "Cornea"))
+        rollup = AnswerRollup.from_store(store)
+    finally:
+        store.close()
+    answered = {row["Urgency"]: row["Answered"] for row in rollup.by_urgency(kb)}
+    assert answered == {"URGENT": 1, UNKNOWN_URGENCY: 2}
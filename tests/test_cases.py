@@ -0,0 +1,48 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import synthetic_knowledge_base
+from cases import MAX_FINDINGS, MAX_HISTORY, MAX_SYMPTOMS, CaseGenerator, CasePool, SeenStems
+from knowledge_base import load_knowledge_base
+
+
+@pytest.fixture(scope="module")
+def generator():
+    return CaseGenerator(load_knowledge_base())
+
+
+def test_stem_ranks_ignore_clue_order():
+    generator = CaseGenerator(synthetic_knowledge_base(50))
+    rng = np.random.default_rng(0)
+    for dx in generator.active_ids.tolist():
+        stems = generator._unseen_stems(dx, SeenStems())
+        assert len(stems) == generator.stem_counts[dx]
+        clues = [
+            rng.permuted([list(clue[kind]) + [-1] * (width - len(clue[kind])) for _, clue in stems], axis=1)
+            for kind, width in enumerate((MAX_SYMPTOMS, MAX_FINDINGS, MAX_HISTORY))
+        ]
+        ranks = generator.stems(np.full(len(stems), dx), clues)
+        assert ranks.tolist() == [rank for rank, _ in stems]
+
+
+def test_pool_shows_every_stem_before_repeating(generator):
+    pool = CasePool(generator, category="Glaucoma")
+    stems = generator.stem_counts[generator.category_ids["Glaucoma"]].sum()
+    shown = [generator.stem(pool.next()) for _ in range(stems)]
+    assert len(set(shown)) == stems
+    # Past that point repeats are allowed, and the seen set stays put
+    size = len(pickle.dumps(pool.seen))
+    for _ in range(50):
+        pool.next()
+    assert len(pickle.dumps(pool.seen)) == size
+
+
+def test_scheduler_picks_stay_clear_of_pooled_stems(generator):
+    pool = CasePool(generator)
+    dx = int(generator.active_ids[0])
+    picked = pool.generate(int(generator.stem_counts[dx]), answers=[dx] * int(generator.stem_counts[dx]))
+    assert len({generator.stem(question) for question in picked}) == len(picked)
+    # That diagnosis is used up, so the pool's own cases move off it
+    assert all(pool.next().answer != dx for _ in range(100))
@@ -0,0 +1,54 @@
+import random
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_diagnoses
+from distractors import DistractorIndex
+from knowledge_base import KnowledgeBase, diff_diagnoses
+
+
+def edited_diagnoses(diagnoses, edits=20, additions=5, removals=0, seed=0):
+    # Copy of `diagnoses` with some entries borrowing another's key finding,
+    # a few new entries appended and some removed, in the watcher's id order
+    rng = random.Random(seed)
+    names = list(diagnoses)
+    edited = dict(diagnoses)
+    for dx in rng.sample(names, edits + removals)[:edits]:
+        donor = diagnoses[rng.choice(names)]
+        edited[dx] = {**diagnoses[dx], "key_finding": donor["key_finding"]}
+    for i in range(additions):
+        donor = diagnoses[rng.choice(names)]
+        edited[f"Added Diagnosis {i}"] = {**donor, "key_finding": f"added finding{i}, {donor['key_finding']}"}
+    for dx in rng.sample([dx for dx in names if edited[dx] == diagnoses[dx]], removals):
+        del edited[dx]
+    return edited
+
+
+def update(index, diagnoses, edited):
+    changed, removed = diff_diagnoses(diagnoses, edited)
+    names = index.names + [dx for dx in changed if dx not in diagnoses]
+    return index.updated(KnowledgeBase(edited), names, changed, removed), names
+
+
+def test_an_update_matches_a_full_rebuild():
+    diagnoses = synthetic_diagnoses(600)
+    edited = edited_diagnoses(diagnoses)
+    index, names = update(DistractorIndex(KnowledgeBase(diagnoses)), diagnoses, edited)
+    rebuilt = DistractorIndex(KnowledgeBase({dx: edited[dx] for dx in names}))
+    assert index.names == rebuilt.names
+    assert np.array_equal(index.neighbors, rebuilt.neighbors)
+    assert np.allclose(index.neighbor_sim, rebuilt.neighbor_sim)
+    assert 0 < index.reranked < len(names)
+
+
+def test_removed_diagnoses_leave_every_neighbour_list():
+    diagnoses = synthetic_diagnoses(600)
+    edited = edited_diagnoses(diagnoses, removals=10)
+    index, names = update(DistractorIndex(KnowledgeBase(diagnoses)), diagnoses, edited)
+    removed = np.flatnonzero(~index.active)
+    assert sorted(names[i] for i in removed) == sorted(set(diagnoses) - set(edited))
+    assert not np.isin(index.neighbors[index.active], removed).any()
+    rng = np.random.default_rng(0)
+    for difficulty in ("near", "mid", "far"):
+        drawn = index.sample(np.flatnonzero(index.active), 3, rng, difficulty)
+        assert not np.isin(drawn, removed).any()
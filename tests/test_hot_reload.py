@@ -0,0 +1,70 @@
+import json
+import os
+import shutil
+import time
+
+from hot_reload import KnowledgeBaseWatcher
+from knowledge_base import DEFAULT_PATH
+
+
+def test_listeners_run_before_the_engine_is_published(tmp_path, monkeypatch):
+    monkeypatch.setenv("TRAINER_KB_SNAPSHOT", "off")
+    path = str(tmp_path / "data")
+    shutil.copytree(DEFAULT_PATH, path)
+    watcher = KnowledgeBaseWatcher(path, interval=0)
+    old = watcher.engine
+    published = []
+    watcher.listeners.append(lambda engine, changed, removed: published.append((watcher.engine, engine, changed)))
+
+    retina = os.path.join(path, "01_retina.json")
+    with open(retina) as f:
+        diagnoses = json.load(f)
+    diagnoses["Test Maculopathy"] = dict(diagnoses["Retinal Detachment"])
+    with open(retina, "w") as f:
+        json.dump(diagnoses, f)
+
+    assert watcher.reload()
+    assert published == [(old, watcher.engine, ["Test Maculopathy"])]
+
+
+def add_diagnosis(path, name):
+    retina = os.path.join(path, "01_retina.json")
+    with open(retina) as f:
+        diagnoses = json.load(f)
+    diagnoses[name] = dict(diagnoses["Retinal Detachment"])
+    with open(retina, "w") as f:
+        json.dump(diagnoses, f)
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.02)
+
+
+def test_the_watcher_keeps_polling_after_a_failed_reload(tmp_path, monkeypatch):
+    monkeypatch.setenv("TRAINER_KB_SNAPSHOT", "off")
+    path = str(tmp_path / "data")
+    shutil.copytree(DEFAULT_PATH, path)
+    watcher = KnowledgeBaseWatcher(path, interval=0.05)
+    failures = [RuntimeError("listener broke")]
+
+    def listener(engine, changed, removed):
+        if failures:
+            raise failures.pop()
+
+    watcher.listeners.append(listener)
+    watcher.start()
+    try:
+        add_diagnosis(path, "Test Maculopathy")
+        wait_for(lambda: watcher.last_error is not None)
+        assert "listener broke" in watcher.last_error
+        assert "Test Maculopathy" not in watcher.engine.kb.diagnoses
+        assert watcher._thread.is_alive()
+
+        add_diagnosis(path, "Test Retinopathy")
+        wait_for(lambda: "Test Retinopathy" in watcher.engine.kb.diagnoses)
+        assert "Test Maculopathy" in watcher.engine.kb.diagnoses
+    finally:
+        watcher.stop()
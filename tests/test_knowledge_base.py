@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+from knowledge_base import load_diagnoses
+
+ENTRY = {
+    "symptoms": ["Sudden painless vision loss"],
+    "key_finding": "Cherry red spot",
+    "urgency": "EMERGENT - within hours",
+    "category": "Retina",
+    "teaching": ["Check for giant cell arteritis"],
+}
+
+
+def write_entry(tmp_path, **fields):
+    path = tmp_path / "01_retina.json"
+    path.write_text(json.dumps({"CRAO": {**ENTRY, **fields}}))
+    return str(path)
+
+
+def test_a_valid_entry_loads(tmp_path):
+    path = write_entry(tmp_path, symptom_weights=[2], age=[50, 90], sex="male", risk_factors=["Smoker"])
+    assert list(load_diagnoses(path)) == ["CRAO"]
+
+
+@pytest.mark.parametrize("fields, error", [
+    ({"age": 60}, "age"),
+    ({"age": [60, "90"]}, "age"),
+    ({"age": [90, 60]}, "age"),
+    ({"symptom_weights": 3}, "symptom_weights"),
+    ({"symptom_weights": [0]}, "symptom_weights"),
+    ({"symptoms": "Sudden painless vision loss"}, "symptoms"),
+    ({"findings": "Cherry red spot"}, "findings"),
+    ({"risk_factors": "Smoker"}, "risk_factors"),
+    ({"risk_factors": [["Smoker"]]}, "risk_factors"),
+    ({"sex": "unknown"}, "sex"),
+])
+def test_a_malformed_field_names_the_file_and_the_diagnosis(tmp_path, fields, error):
+    path = write_entry(tmp_path, **fields)
+    with pytest.raises(ValueError) as excinfo:
+        load_diagnoses(path)
+    message = str(excinfo.value)
+    assert path in message and "'CRAO'" in message and error in message
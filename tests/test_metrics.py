@@ -0,0 +1,14 @@
+from metrics import Histogram, REGISTRY
+
+
+def test_a_batch_observation_counts_every_sample():
+    histogram = Histogram("test_generate_seconds", "Test", [0.01, 0.1], ["mode"])
+    try:
+        histogram.observe(0.05, "practice")
+        histogram.observe(0.005, "exam", count=20)
+        assert (histogram.count("practice"), histogram.count("exam")) == (1, 20)
+        lines = list(histogram.lines())
+        assert 'test_generate_seconds_bucket{mode="exam",le="0.01"} 20' in lines
+        assert 'test_generate_seconds_sum{mode="exam"} 0.1' in lines
+    finally:
+        REGISTRY.remove(histogram)
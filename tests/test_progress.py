@@ -0,0 +1,165 @@
+import threading
+import time
+
+import pytest
+
+from progress import PROGRESS_BACKENDS, WRITE_ATTEMPTS, FileProgressStore, make_event, open_progress_store
+
+
+@pytest.fixture(params=sorted(PROGRESS_BACKENDS))
+def store_path(request, tmp_path):
+    return request.param, str(tmp_path / PROGRESS_BACKENDS[request.param][1])
+
+
+@pytest.fixture
+def store(store_path):
+    store = open_progress_store(*store_path)
+    yield store
+    store.close()
+
+
+def answer(store, user_id, diagnosis, chosen, category="Retina", answered_at=None):
+    store.record(make_event(user_id, diagnosis, chosen, 4.0, category, answered_at))
+
+
+def test_summary_counts_without_waiting_for_disk(store):
+    answer(store, "pgy1-a", "CRAO", "CRAO")
+    answer(store, "pgy1-a", "CRAO", "BRVO")
+    answer(store, "pgy1-a", "Cataract", "Cataract", category="Cornea")
+    stats = store.summary("pgy1-a")
+    assert (stats.answered, stats.correct) == (3, 2)
+    assert stats.categories == {"Retina": [2, 1], "Cornea": [1, 1]}
+    assert store.summary("pgy1-b").answered == 0
+
+
+def test_history_is_oldest_first(store):
+    for i, chosen in enumerate(["CRAO", "BRVO", "CRAO"]):
+        answer(store, "pgy1-a", "CRAO", chosen, answered_at=100.0 + i)
+    answer(store, "pgy1-b", "CRAO", "CRAO")
+    assert [tuple(row) for row in store.history("pgy1-a")] == [
+        ("CRAO", True, 100.0), ("CRAO", False, 101.0), ("CRAO", True, 102.0)
+    ]
+
+
+def test_progress_survives_a_restart(store_path):
+    store = open_progress_store(*store_path)
+    answer(store, "pgy1-a", "CRAO", "CRAO")
+    answer(store, "pgy1-a", "CRAO", "BRVO")
+    store.close()
+
+    reopened = open_progress_store(*store_path)
+    try:
+        stats = reopened.summary("pgy1-a")
+        assert (stats.answered, stats.correct) == (2, 1)
+        assert len(reopened.history("pgy1-a")) == 2
+    finally:
+        reopened.close()
+
+
+def test_reset_restarts_totals_but_keeps_the_rollup(store):
+    answer(store, "pgy1-a", "CRAO", "BRVO")
+    store.reset("pgy1-a")
+    assert store.summary("pgy1-a").answered == 0
+    assert store.history("pgy1-a") == []
+    answer(store, "pgy1-a", "CRAO", "CRAO")
+    assert store.summary("pgy1-a").answered == 1
+
+    rows, names = store.rollup()
+    answered = {(names[user], names[dx], names[chosen]): count for user, dx, chosen, _, count, *_ in rows}
+    assert answered == {("pgy1-a", "CRAO", "BRVO"): 1, ("pgy1-a", "CRAO", "CRAO"): 1}
+
+
+def test_flush_does_not_wait_for_later_events(store):
+    # Other sessions keep recording while one reads its history
+    stop = threading.Event()
+
+    def record_forever():
+        while not stop.is_set():
+            answer(store, "pgy1-busy", "CRAO", "CRAO")
+            time.sleep(0.001)
+
+    writers = [threading.Thread(target=record_forever) for _ in range(4)]
+    for writer in writers:
+        writer.start()
+    try:
+        answer(store, "pgy1-a", "CRAO", "CRAO")
+        start = time.perf_counter()
+        history = store.history("pgy1-a")
+        elapsed = time.perf_counter() - start
+    finally:
+        stop.set()
+        for writer in writers:
+            writer.join()
+    assert len(history) == 1
+    assert elapsed < store.flush_interval * 2
+
+
+class FlakyFileStore(FileProgressStore):
+    # Fails its first `failures` writes, as a locked database or a full disk would
+    def __init__(self, path, failures, **kwargs):
+        self.failures = failures
+        super().__init__(path, **kwargs)
+
+    def _write_batch(self, events):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk full")
+        super()._write_batch(events)
+
+
+def test_a_failed_write_is_retried_and_the_writer_keeps_going(tmp_path):
+    store = FlakyFileStore(str(tmp_path / "progress.jsonl"), failures=1, flush_interval=0.05)
+    try:
+        answer(store, "pgy1-a", "CRAO", "CRAO")
+        store.flush()
+        assert store._writer.is_alive()
+        answer(store, "pgy1-a", "CRAO", "BRVO")
+        assert [correct for _, correct, _ in store.history("pgy1-a")] == [True, False]
+        assert store.dropped == 0
+    finally:
+        store.close()
+
+
+def test_a_batch_that_keeps_failing_is_dropped(tmp_path):
+    store = FlakyFileStore(str(tmp_path / "progress.jsonl"), failures=WRITE_ATTEMPTS, flush_interval=0.05)
+    try:
+        answer(store, "pgy1-a", "CRAO", "CRAO")
+        for _ in range(WRITE_ATTEMPTS):
+            store.flush()
+        assert store.dropped == 1
+        answer(store, "pgy1-a", "CRAO", "BRVO")
+        assert [correct for _, correct, _ in store.history("pgy1-a")] == [False]
+    finally:
+        store.close()
+
+
+def test_flush_returns_when_the_writer_is_gone(tmp_path):
+    class NoWriterStore(FileProgressStore):
+        def _run(self):
+            pass
+
+    store = NoWriterStore(str(tmp_path / "progress.jsonl"), flush_interval=0.05)
+    try:
+        store._writer.join()
+        answer(store, "pgy1-a", "CRAO", "CRAO")
+        assert len(store.history("pgy1-a")) == 1
+    finally:
+        store.close()
+
+
+def test_workers_see_each_others_answers_and_resets(store_path):
+    backend, path = store_path
+    store_class = PROGRESS_BACKENDS[backend][0]
+    worker_a = store_class(path, stats_ttl=0)
+    worker_b = store_class(path, stats_ttl=0)
+    try:
+        answer(worker_a, "pgy1-a", "CRAO", "CRAO", answered_at=100.0)
+        worker_a.flush()
+        assert worker_b.summary("pgy1-a").answered == 1
+        worker_a.reset("pgy1-a")
+        stats = worker_b.summary("pgy1-a")
+        assert stats.answered == 0
+        assert stats.reset_at == worker_a.summary("pgy1-a").reset_at > 0
+    finally:
+        worker_a.close()
+        worker_b.close()
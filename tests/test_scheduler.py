@@ -0,0 +1,54 @@
+from collections import Counter
+
+from scheduler import BOX_INTERVALS, Scheduler
+
+
+def test_a_correct_answer_promotes_and_a_wrong_one_demotes():
+    scheduler = Scheduler(["Retina"], seed=0)
+    for box in range(1, len(BOX_INTERVALS) + 2):
+        scheduler.record("pgy1-a", 0, True, now=1000.0)
+        expected = min(box, len(BOX_INTERVALS) - 1)
+        assert scheduler._users["pgy1-a"].cards[0] == (expected, 1000.0 + BOX_INTERVALS[expected])
+    scheduler.record("pgy1-a", 0, False, now=2000.0)
+    assert scheduler._users["pgy1-a"].cards[0] == (0, 2000.0 + BOX_INTERVALS[0])
+
+
+def test_due_cards_come_back_earliest_first():
+    scheduler = Scheduler(["Retina"] * 3, seed=0)
+    # Box 1, box 0 and box 2 intervals from the same start
+    scheduler.add_user("pgy1-a", [(0, True, 0.0), (1, False, 0.0), (2, True, 0.0), (2, True, 0.0)])
+    now = 1e6
+    picks = []
+    for _ in range(3):
+        dx_id = scheduler.next("pgy1-a", now=now)
+        picks.append(dx_id)
+        scheduler.record("pgy1-a", dx_id, True, now=now)
+    assert picks == [1, 0, 2]
+
+
+def test_new_cards_come_before_cards_not_yet_due():
+    scheduler = Scheduler(["Retina"] * 2, seed=0)
+    scheduler.record("pgy1-a", 0, True, now=0.0)
+    assert scheduler.next("pgy1-a", now=1.0) == 1
+    assert scheduler.next("pgy1-a", now=BOX_INTERVALS[1] + 1.0) == 0
+
+
+def test_weak_category_favours_the_most_missed():
+    scheduler = Scheduler(["Retina", "Cornea", "Glaucoma"], seed=0)
+    stats = {"Retina": [20, 2], "Cornea": [20, 18], "Glaucoma": [20, 18]}
+    picks = Counter(scheduler.weak_category(stats) for _ in range(2000))
+    assert picks["Retina"] > 3 * max(picks["Cornea"], picks["Glaucoma"])
+    assert picks["Cornea"] and picks["Glaucoma"]
+
+
+def test_a_reload_drops_removed_cards_and_refiles_moved_ones():
+    scheduler = Scheduler(["Retina", "Retina", "Retina"], seed=0)
+    scheduler.add_user("pgy1-a", [(0, False, 0.0), (1, False, 0.0), (2, True, 0.0)])
+    scheduler.update_categories([None, "Cornea", "Retina", "Cornea"])
+    now = 1e6
+    assert scheduler.next("pgy1-a", category="Retina", now=now) == 2
+    assert scheduler._users["pgy1-a"].heaps["Retina"] == [(BOX_INTERVALS[1], 2)]
+    assert scheduler.next("pgy1-a", category="Cornea", now=now) == 1
+    scheduler.record("pgy1-a", 1, True, now=now)
+    assert scheduler.next("pgy1-a", category="Cornea", now=now) == 3
+    assert 0 not in [scheduler.next("pgy1-a", now=now) for _ in range(20)]
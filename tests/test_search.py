@@ -0,0 +1,26 @@
+from benchmarks.synthetic import synthetic_diagnoses
+from knowledge_base import KnowledgeBase
+from search import SearchIndex
+from test_distractors import edited_diagnoses, update
+
+
+def by_name(index):
+    # Postings and categories keyed by diagnosis name, so indexes whose ids
+    # differ (removed entries keep theirs after an update) compare equal
+    postings = {
+        term: {index.names[dx_id]: tf for dx_id, tf in entries.items()}
+        for term, entries in index.postings.items()
+    }
+    categories = {dx: category for dx, category in zip(index.names, index.category_of) if category is not None}
+    trigram_index = {gram: sorted(terms) for gram, terms in index.trigram_index.items() if terms}
+    return postings, categories, index.vocabulary, trigram_index, index.total
+
+
+def test_an_update_matches_a_full_rebuild():
+    diagnoses = synthetic_diagnoses(600)
+    edited = edited_diagnoses(diagnoses, removals=10)
+    index, _ = update(SearchIndex(KnowledgeBase(diagnoses)), diagnoses, edited)
+    rebuilt = SearchIndex(KnowledgeBase(edited))
+    assert by_name(index) == by_name(rebuilt)
+    for query in ("finding1", "finding2 finding3", "findin", "added", "fidning7"):
+        assert dict(index.search(query, limit=1000)) == dict(rebuilt.search(query, limit=1000))
@@ -0,0 +1,18 @@
+import snapshot
+
+
+def test_snapshot_is_rebuilt_when_the_source_or_the_code_changes(tmp_path, monkeypatch):
+    path = str(tmp_path / "snapshot.pickle")
+    engine, source = snapshot.load_engine(path=path)
+    loaded = snapshot.load_snapshot(path, source)
+    assert loaded is not None and loaded.kb.total_diagnoses == engine.kb.total_diagnoses
+
+    assert snapshot.load_snapshot(path, "edited data") is None
+    monkeypatch.setattr(snapshot, "_code_hash", "edited code")
+    assert snapshot.load_snapshot(path, source) is None
+
+
+def test_unreadable_snapshot_is_ignored(tmp_path):
+    path = tmp_path / "snapshot.pickle"
+    path.write_bytes(b"not a pickle")
+    assert snapshot.load_snapshot(str(path), "source") is None